@@ -0,0 +1,52 @@
+"""Helpers shared by the users-function benchmarks."""
+
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+FISSION_DIR = Path(__file__).resolve().parent.parent
+# Benchmarks inject their own client; keep the function from opening one on import.
+os.environ.setdefault("MONGO_PREWARM", "false")
+if str(FISSION_DIR) not in sys.path:
+    sys.path.insert(0, str(FISSION_DIR))
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples_ms: List[float], wall_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """Latency percentiles plus throughput.
+
+    Throughput comes from ``wall_seconds`` when given (required once requests
+    overlap) and otherwise from the summed sample time of a sequential run.
+    """
+    if not samples_ms:
+        return {"iterations": 0}
+    total_seconds = wall_seconds if wall_seconds is not None else sum(samples_ms) / 1000
+    return {
+        "iterations": len(samples_ms),
+        "throughput_rps": round(len(samples_ms) / total_seconds, 2) if total_seconds else None,
+        "mean_ms": round(statistics.fmean(samples_ms), 3),
+        "p50_ms": round(percentile(samples_ms, 0.50), 3),
+        "p99_ms": round(percentile(samples_ms, 0.99), 3),
+    }
+
+
+def git_revision() -> Optional[str]:
+    try:
+        completed = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=FISSION_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip() or None
@@ -0,0 +1,126 @@
+"""Measure the users function's per-request framework overhead.
+
+Every ``handle_*`` resource handler is replaced by a stub that returns
+immediately, so the timings cover only what ``users.main.main`` does around
+them: request decoding, path resolution, the deadline and admission checks,
+routing and building the response. No MongoDB is needed.
+
+    python fission/bench/framework.py --iterations 20000
+    python fission/bench/framework.py --output after.json --compare before.json
+
+Requests mimic the Fission router: the path travels both in ``__path`` and in
+``x-tessaro-path``, alongside the header set a Bun ``fetch`` sends.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from common import git_revision, summarize
+
+from users import main as users_main  # noqa: E402
+
+ROUTER_HEADERS = {
+    "Accept": "application/json",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Connection": "keep-alive",
+    "Content-Type": "application/json",
+    "Host": "router.fission.svc.cluster.local",
+    "User-Agent": "Bun/1.1.30",
+    "X-Fission-Function-Name": "tessaro-users",
+    "X-Fission-Function-Namespace": "default",
+    "X-Fission-Function-Resourceversion": "184467",
+    "X-Fission-Function-Uid": "2f0d9b1c-6a8e-4d7e-9a51-0c6a4bb7e4f2",
+    "X-Forwarded-For": "10.42.0.17",
+    "X-Forwarded-Proto": "http",
+}
+
+REQUESTS: List[Tuple[str, str, str, Optional[Dict[str, Any]]]] = [
+    ("users.get", "GET", "/tessaro/users/5b0f4a2e-1d8c-4a07-9a53-7f0c3c9b1e21", None),
+    ("users.by_email", "GET", f"/tessaro/users?email={quote('first.last+tag@example.com')}", None),
+    ("users.list", "GET", "/tessaro/users?organization_id=org-1", None),
+    ("users.update", "PATCH", "/tessaro/users/5b0f4a2e-1d8c-4a07-9a53-7f0c3c9b1e21", {"name": "Renamed"}),
+    ("sessions.get", "GET", "/tessaro/sessions/9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08", None),
+    ("metrics.increment", "POST", "/tessaro/metrics/increment", {"key": "logins"}),
+    ("services.query", "POST", "/tessaro/services/query", {"organization_ids": ["org-1", "org-2"]}),
+    ("users.changes", "GET", "/tessaro/users/changes?limit=500", None),
+]
+
+
+def stub_handlers() -> None:
+    def stub(*_args, **_kwargs):
+        return users_main.no_content()
+
+    for name in dir(users_main):
+        if name.startswith("handle_") and name != "handle_request":
+            setattr(users_main, name, stub)
+
+
+def fission_context(method: str, path: str) -> Dict[str, Any]:
+    return {
+        "request": {
+            "method": method,
+            "url": f"http://router.fission.svc.cluster.local/tessaro?__path={quote(path, safe='')}",
+            "path": "/tessaro",
+            "headers": {**ROUTER_HEADERS, "X-Tessaro-Path": path},
+        }
+    }
+
+
+def run_request(method: str, path: str, body: Optional[Dict[str, Any]], iterations: int) -> Tuple[List[float], int]:
+    context = fission_context(method, path)
+    data = json.dumps(body) if body is not None else None
+    samples: List[float] = []
+    status = 0
+    sink = io.StringIO()
+    with contextlib.redirect_stdout(sink):
+        for _ in range(iterations):
+            started = time.perf_counter()
+            _payload, status, _headers = users_main.main(context, data)
+            samples.append((time.perf_counter() - started) * 1000)
+            sink.seek(0)
+            sink.truncate()
+    return samples, status
+
+
+def compare(current: Dict[str, Any], baseline_path: str) -> None:
+    with open(baseline_path, encoding="utf-8") as handle:
+        baseline = json.load(handle)
+    print(f"\n{'request':<20} {'before µs':>10} {'after µs':>10} {'change':>8}")
+    for name, result in current["requests"].items():
+        before = baseline["requests"].get(name)
+        if not before:
+            continue
+        before_us, after_us = before["mean_ms"] * 1000, result["mean_ms"] * 1000
+        print(f"{name:<20} {before_us:>10.1f} {after_us:>10.1f} {(after_us - before_us) / before_us:>+8.1%}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=10_000)
+    parser.add_argument("--warmup", type=int, default=500)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="earlier --output file to compare against")
+    args = parser.parse_args()
+
+    stub_handlers()
+    results: Dict[str, Any] = {"revision": git_revision(), "iterations": args.iterations, "requests": {}}
+    for name, method, path, body in REQUESTS:
+        run_request(method, path, body, args.warmup)
+        samples, status = run_request(method, path, body, args.iterations)
+        results["requests"][name] = {"status": status, **summarize(samples)}
+        print(f"{name:<20} {json.dumps(results['requests'][name])}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
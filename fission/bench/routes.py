@@ -0,0 +1,671 @@
+"""Benchmark every route served by ``users.main.main``.
+
+Seeds a scratch MongoDB at a chosen scale, then replays each route either
+in-process (calling ``users.main.main`` with a Fission-style context) or over
+HTTP (against a running function or the Fission router), and writes
+throughput, p50/p99 latency and Mongo round trips per request to JSON.
+
+    python fission/bench/routes.py --uri mongodb://localhost:27017 --scale 1k --output bench-1k.json
+    python fission/bench/routes.py --mode http --base-url http://fission.dino.home --skip-seed
+    python fission/bench/routes.py --scale 1k --output after.json --compare before.json
+    python fission/bench/routes.py --mode http --base-url http://fission.dino.home --skip-seed --concurrency 16
+
+Round trips are counted from the function's command listener and are only
+available in-process. With ``--concurrency N`` each scenario is driven by N
+worker threads (one HTTP connection each); throughput is then measured over
+wall-clock time and the status counts show how much was shed (429) or ran out
+of deadline (504).
+"""
+
+import argparse
+import contextlib
+import datetime as dt
+import hashlib
+import http.client
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote, urlparse
+
+from common import git_revision, summarize
+
+from users import main as users_main  # noqa: E402  (adds the vendored driver to sys.path)
+
+from gridfs import GridFSBucket  # noqa: E402
+from pymongo import MongoClient  # noqa: E402
+
+SCALES = {
+    "1k": {"users": 1_000, "organizations": 20, "services": 50},
+    "100k": {"users": 100_000, "organizations": 500, "services": 1_000},
+    "1m": {"users": 1_000_000, "organizations": 2_000, "services": 5_000},
+}
+SEED_BATCH_SIZE = 10_000
+# A 64 KiB stand-in for a typical compressed avatar.
+AVATAR_BYTES = b"\x89PNG\r\n\x1a\n" + random.Random(0).randbytes(64 * 1024 - 8)
+
+
+class Scenario:
+    """One route under test.
+
+    ``path`` and ``body`` receive the seeded state and the iteration index;
+    ``prepare`` runs untimed before each iteration and may stash per-iteration
+    values in the state (e.g. a document for a DELETE to remove). A ``bytes``
+    body is sent raw as ``image/png`` instead of JSON.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        method: str,
+        path: Callable[[Dict[str, Any], int], str],
+        body: Optional[Callable[[Dict[str, Any], int], Any]] = None,
+        prepare: Optional[Callable[[Dict[str, Any], int], None]] = None,
+        bulk: bool = False,
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.body = body
+        self.prepare = prepare
+        self.bulk = bulk
+        self.headers = headers or {}
+
+
+def seed(database, scale: Dict[str, int], rng: random.Random) -> Dict[str, Any]:
+    timestamp = users_main.utc_now()
+    # Tombstones and avatars from earlier runs would skew the changes and export numbers.
+    scratch = (users_main.DELETIONS_COLLECTION, f"{users_main.AVATAR_BUCKET}.files", f"{users_main.AVATAR_BUCKET}.chunks")
+    for name in ("users", "organizations", "services", "metrics", "sessions", "user_credentials", *scratch):
+        database[name].drop()
+    users_main.ensure_indexes(database)
+
+    organization_ids = [f"bench-org-{index}" for index in range(scale["organizations"])]
+    database["organizations"].insert_many(
+        {
+            "_id": org_id,
+            "name": f"Bench Org {index}",
+            "plan": "standard",
+            "status": "active",
+            "created_at": timestamp,
+            "updated_at": timestamp,
+            "version": 1,
+        }
+        for index, org_id in enumerate(organization_ids)
+    )
+
+    service_ids = [f"bench-service-{index}" for index in range(scale["services"])]
+    services = []
+    for index, service_id in enumerate(service_ids):
+        linked = rng.sample(organization_ids, k=min(3, len(organization_ids)))
+        services.append({
+            "_id": service_id,
+            "name": f"Bench Service {index}",
+            "service_type": "api",
+            "status": "active",
+            "organization_ids": linked,
+            "organization_count": len(linked),
+            "description": None,
+            "created_at": timestamp,
+            "updated_at": timestamp,
+            "version": 1,
+        })
+    database["services"].insert_many(services)
+
+    user_ids: List[str] = []
+    batch: List[Dict[str, Any]] = []
+    for index in range(scale["users"]):
+        user_id = f"bench-user-{index}"
+        user_ids.append(user_id)
+        batch.append({
+            "_id": user_id,
+            "name": f"Bench User {index}",
+            "email": f"user{index}@bench.tessaro",
+            "role": "member",
+            "avatar_url": None,
+            "organization_ids": rng.sample(organization_ids, k=min(rng.randint(1, 3), len(organization_ids))),
+            "created_at": timestamp,
+            "updated_at": timestamp,
+            "version": 1,
+        })
+        if len(batch) >= SEED_BATCH_SIZE:
+            database["users"].insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        database["users"].insert_many(batch, ordered=False)
+
+    session_hashes = [uuid.uuid4().hex for _ in range(min(1_000, len(user_ids)))]
+    database["sessions"].insert_many(
+        {
+            "_id": token_hash,
+            "token_hash": token_hash,
+            "user_id": user_ids[index],
+            "organization_id": None,
+            "issued_at": timestamp,
+            "expires_at": timestamp + dt.timedelta(days=30),
+            "created_at": timestamp,
+            "updated_at": timestamp,
+        }
+        for index, token_hash in enumerate(session_hashes)
+    )
+    database["metrics"].insert_many([
+        {"_id": "bench-number", "key": "bench-number", "kind": "number", "value": 0},
+        {"_id": "bench-timestamp", "key": "bench-timestamp", "kind": "timestamp", "value": timestamp},
+    ])
+
+    return {
+        "organization_ids": organization_ids,
+        "service_ids": service_ids,
+        "user_ids": user_ids,
+        "session_hashes": session_hashes,
+    }
+
+
+def load_state(database) -> Dict[str, Any]:
+    """Rebuild scenario state from an already seeded database (``--skip-seed``)."""
+
+    def ids(collection: str, prefix: str) -> List[str]:
+        cursor = database[collection].find({"_id": {"$regex": f"^{prefix}"}}, {"_id": 1}).limit(10_000)
+        return [doc["_id"] for doc in cursor]
+
+    return {
+        "organization_ids": ids("organizations", "bench-org-"),
+        "service_ids": ids("services", "bench-service-"),
+        "user_ids": ids("users", "bench-user-"),
+        "session_hashes": [doc["_id"] for doc in database["sessions"].find({}, {"_id": 1}).limit(1_000)],
+    }
+
+
+def pick(values: List[str], index: int) -> str:
+    return values[index % len(values)]
+
+
+def seeded_email(user_id: str) -> str:
+    return f"user{user_id.rsplit('-', 1)[-1]}@bench.tessaro"
+
+
+def create_scratch(kind: str) -> Callable[[Dict[str, Any], int], None]:
+    """Untimed setup that creates a throwaway document for a DELETE scenario."""
+
+    def prepare(state: Dict[str, Any], index: int) -> None:
+        identifier = f"bench-scratch-{kind}-{uuid.uuid4().hex}"
+        doc: Dict[str, Any] = {"_id": identifier, "name": identifier, "version": 1}
+        if kind == "users":
+            doc.update({"email": f"{identifier}@bench.tessaro", "organization_ids": [pick(state["organization_ids"], index)]})
+        state["database"][kind].insert_one(doc)
+        state["scratch_id"] = identifier
+
+    return prepare
+
+
+def create_scratch_sessions(state: Dict[str, Any], index: int) -> None:
+    user_id = f"bench-scratch-sessions-{uuid.uuid4().hex}"
+    timestamp = users_main.utc_now()
+    state["database"]["sessions"].insert_many(
+        [
+            {
+                "_id": token_hash,
+                "token_hash": token_hash,
+                "user_id": user_id,
+                "issued_at": timestamp,
+                "expires_at": timestamp + dt.timedelta(hours=12),
+            }
+            for token_hash in (uuid.uuid4().hex for _ in range(3))
+        ]
+    )
+    state["scratch_id"] = user_id
+
+
+_avatar_lock = threading.Lock()
+
+
+def ensure_avatar(state: Dict[str, Any], index: int) -> None:
+    # Written straight to the bench database so it works in HTTP mode too; the
+    # lock keeps concurrent workers from uploading it twice.
+    with _avatar_lock:
+        if "avatar_user_id" in state:
+            return
+        user_id = state["user_ids"][0]
+        existing = state["database"]["users"].find_one({"_id": user_id}, {"avatar": 1}) or {}
+        if not existing.get("avatar"):
+            store_avatar(state["database"], user_id)
+        state["avatar_user_id"] = user_id
+
+
+def store_avatar(database, user_id: str) -> None:
+    """Upload ``AVATAR_BYTES`` for ``user_id`` the way ``PUT .../avatar`` stores it."""
+    file_id = str(uuid.uuid4())
+    bucket = GridFSBucket(database, bucket_name=users_main.AVATAR_BUCKET)
+    bucket.upload_from_stream_with_id(file_id, user_id, AVATAR_BYTES, metadata={"user_id": user_id})
+    database["users"].update_one(
+        {"_id": user_id},
+        {
+            "$set": {
+                "avatar": {
+                    "file_id": file_id,
+                    "etag": hashlib.sha256(AVATAR_BYTES).hexdigest(),
+                    "content_type": "image/png",
+                    "length": len(AVATAR_BYTES),
+                    "uploaded_at": users_main.utc_now(),
+                }
+            }
+        },
+    )
+
+
+def create_scratch_avatar(state: Dict[str, Any], index: int) -> None:
+    """Untimed setup: a throwaway user with an avatar for the avatar DELETE scenario."""
+    create_scratch("users")(state, index)
+    store_avatar(state["database"], state["scratch_id"])
+
+
+def build_scenarios() -> List[Scenario]:
+    run_id = uuid.uuid4().hex[:8]
+    return [
+        Scenario("users.list", "GET", lambda s, i: "/tessaro/users", bulk=True),
+        Scenario("users.count", "GET", lambda s, i: "/tessaro/users?summary=count", bulk=True),
+        Scenario("users.by_email", "GET", lambda s, i: f"/tessaro/users?email={quote(seeded_email(pick(s['user_ids'], i)))}"),
+        Scenario("users.get", "GET", lambda s, i: f"/tessaro/users/{pick(s['user_ids'], i)}"),
+        Scenario(
+            "users.create",
+            "POST",
+            lambda s, i: "/tessaro/users",
+            lambda s, i: {
+                "email": f"bench-{run_id}-{i}@bench.tessaro",
+                "name": "Bench Create",
+                "organization_ids": [pick(s["organization_ids"], i)],
+            },
+        ),
+        Scenario("users.update", "PATCH", lambda s, i: f"/tessaro/users/{pick(s['user_ids'], i)}", lambda s, i: {"name": f"Renamed {i}"}),
+        Scenario(
+            "users.replace",
+            "PUT",
+            lambda s, i: f"/tessaro/users/{pick(s['user_ids'], i)}",
+            lambda s, i: {
+                "name": f"Replaced {i}",
+                "email": seeded_email(pick(s["user_ids"], i)),
+                "role": "member",
+                "organization_ids": [pick(s["organization_ids"], i)],
+            },
+        ),
+        Scenario("users.delete", "DELETE", lambda s, i: f"/tessaro/users/{s['scratch_id']}", prepare=create_scratch("users")),
+        Scenario("organizations.list", "GET", lambda s, i: "/tessaro/organizations", bulk=True),
+        Scenario("organizations.count", "GET", lambda s, i: "/tessaro/organizations?summary=count", bulk=True),
+        Scenario("organizations.get", "GET", lambda s, i: f"/tessaro/organizations/{pick(s['organization_ids'], i)}"),
+        Scenario(
+            "organizations.create",
+            "POST",
+            lambda s, i: "/tessaro/organizations",
+            lambda s, i: {"name": f"Bench Org {run_id}-{i}"},
+        ),
+        Scenario(
+            "organizations.update",
+            "PATCH",
+            lambda s, i: f"/tessaro/organizations/{pick(s['organization_ids'], i)}",
+            lambda s, i: {"plan": "enterprise" if i % 2 else "standard"},
+        ),
+        Scenario(
+            "organizations.replace",
+            "PUT",
+            lambda s, i: f"/tessaro/organizations/{pick(s['organization_ids'], i)}",
+            lambda s, i: {"plan": "standard", "status": "active"},
+        ),
+        Scenario(
+            "organizations.delete",
+            "DELETE",
+            lambda s, i: f"/tessaro/organizations/{s['scratch_id']}",
+            prepare=create_scratch("organizations"),
+        ),
+        Scenario("services.list", "GET", lambda s, i: "/tessaro/services", bulk=True),
+        Scenario("services.count", "GET", lambda s, i: "/tessaro/services?summary=count", bulk=True),
+        Scenario("services.get", "GET", lambda s, i: f"/tessaro/services/{pick(s['service_ids'], i)}"),
+        Scenario(
+            "services.query",
+            "POST",
+            lambda s, i: "/tessaro/services/query",
+            lambda s, i: {"organization_ids": [pick(s["organization_ids"], i)]},
+        ),
+        Scenario(
+            "services.create",
+            "POST",
+            lambda s, i: "/tessaro/services",
+            lambda s, i: {"name": f"Bench Service {run_id}-{i}", "service_type": "api"},
+        ),
+        Scenario(
+            "services.update",
+            "PATCH",
+            lambda s, i: f"/tessaro/services/{pick(s['service_ids'], i)}",
+            lambda s, i: {"description": f"updated {i}"},
+        ),
+        Scenario(
+            "services.replace",
+            "PUT",
+            lambda s, i: f"/tessaro/services/{pick(s['service_ids'], i)}",
+            lambda s, i: {"service_type": "api", "status": "active", "description": f"replaced {i}"},
+        ),
+        Scenario("services.delete", "DELETE", lambda s, i: f"/tessaro/services/{s['scratch_id']}", prepare=create_scratch("services")),
+        Scenario("users.changes", "GET", lambda s, i: "/tessaro/users/changes?limit=500", bulk=True),
+        Scenario("organizations.changes", "GET", lambda s, i: "/tessaro/organizations/changes?limit=500", bulk=True),
+        Scenario("services.changes", "GET", lambda s, i: "/tessaro/services/changes?limit=500", bulk=True),
+        Scenario("export.users.ndjson", "GET", lambda s, i: "/tessaro/export/users", bulk=True),
+        Scenario("export.users.bson", "GET", lambda s, i: "/tessaro/export/users?format=bson", bulk=True),
+        Scenario("export.users.gzip", "GET", lambda s, i: "/tessaro/export/users?compression=gzip", bulk=True),
+        Scenario("metrics.increment", "POST", lambda s, i: "/tessaro/metrics/increment", lambda s, i: {"key": "bench-number"}),
+        Scenario("metrics.number.set", "POST", lambda s, i: "/tessaro/metrics/number", lambda s, i: {"key": "bench-number", "value": i}),
+        Scenario("metrics.number.get", "GET", lambda s, i: "/tessaro/metrics/number?key=bench-number"),
+        Scenario(
+            "metrics.timestamp.set",
+            "POST",
+            lambda s, i: "/tessaro/metrics/timestamp",
+            lambda s, i: {"key": "bench-timestamp", "value": users_main.utc_now().isoformat()},
+        ),
+        Scenario("metrics.timestamp.get", "GET", lambda s, i: "/tessaro/metrics/timestamp?key=bench-timestamp"),
+        Scenario(
+            "sessions.create",
+            "POST",
+            lambda s, i: "/tessaro/sessions",
+            lambda s, i: session_body(uuid.uuid4().hex, pick(s["user_ids"], i)),
+        ),
+        Scenario("sessions.get", "GET", lambda s, i: f"/tessaro/sessions/{pick(s['session_hashes'], i)}"),
+        Scenario(
+            "sessions.replace",
+            "PUT",
+            lambda s, i: f"/tessaro/sessions/{pick(s['session_hashes'], i)}",
+            lambda s, i: session_body(pick(s["session_hashes"], i), pick(s["user_ids"], i)),
+        ),
+        Scenario("sessions.delete", "DELETE", lambda s, i: f"/tessaro/sessions/{uuid.uuid4().hex}"),
+        Scenario(
+            "sessions.revoke_user",
+            "DELETE",
+            lambda s, i: f"/tessaro/sessions?user_id={s['scratch_id']}",
+            prepare=create_scratch_sessions,
+        ),
+        Scenario(
+            "user_credentials.set",
+            "POST",
+            lambda s, i: "/tessaro/user-credentials",
+            lambda s, i: {"user_id": pick(s["user_ids"], i), "password": f"bench-password-{i}"},
+        ),
+        Scenario(
+            "avatar.upload",
+            "PUT",
+            lambda s, i: f"/tessaro/users/{pick(s['user_ids'], i + 1)}/avatar",
+            lambda s, i: AVATAR_BYTES,
+        ),
+        Scenario("avatar.get", "GET", lambda s, i: f"/tessaro/users/{s['avatar_user_id']}/avatar", prepare=ensure_avatar),
+        Scenario(
+            "avatar.get.range",
+            "GET",
+            lambda s, i: f"/tessaro/users/{s['avatar_user_id']}/avatar",
+            prepare=ensure_avatar,
+            headers={"range": "bytes=0-4095"},
+        ),
+        Scenario(
+            "avatar.delete",
+            "DELETE",
+            lambda s, i: f"/tessaro/users/{s['scratch_id']}/avatar",
+            prepare=create_scratch_avatar,
+        ),
+        Scenario("admission.stats", "GET", lambda s, i: "/tessaro/admission"),
+        # Runs after the avatar scenarios so exported users carry an ``avatar`` subdocument.
+        Scenario("export.users.with_avatars", "GET", lambda s, i: "/tessaro/export/users", prepare=ensure_avatar, bulk=True),
+        Scenario("pool.stats", "GET", lambda s, i: "/tessaro/pool"),
+    ]
+
+
+def session_body(token_hash: str, user_id: str) -> Dict[str, Any]:
+    issued_at = dt.datetime.now(dt.timezone.utc)
+    return {
+        "token_hash": token_hash,
+        "user_id": user_id,
+        "organization_id": None,
+        "issued_at": issued_at.isoformat(),
+        "expires_at": (issued_at + dt.timedelta(hours=12)).isoformat(),
+    }
+
+
+class InProcessTarget:
+    round_trips_available = True
+
+    def __init__(self, client: MongoClient, listing_client: MongoClient, database_name: str, show_logs: bool):
+        # Same wiring as users_main.get_database(), minus reading the cluster secrets.
+        users_main._client = client
+        users_main._database = client[database_name]
+        users_main._listing_client = listing_client if listing_client is not client else None
+        users_main._listing_database = listing_client[database_name]
+        users_main._indexes_ready = True
+        users_main._collections.clear()
+        self.show_logs = show_logs
+
+    def quiet(self):
+        # redirect_stdout swaps a process-wide stream, so it wraps a whole run
+        # rather than each (possibly concurrent) call.
+        if self.show_logs:
+            return contextlib.nullcontext()
+        stack = contextlib.ExitStack()
+        stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+        return stack
+
+    def call(self, method: str, path: str, body: Any, headers: Dict[str, str]) -> Tuple[int, Optional[int]]:
+        content_type = "image/png" if isinstance(body, bytes) else "application/json"
+        context = {
+            "request": {
+                "method": method,
+                "url": f"http://bench.local/tessaro?__path={quote(path, safe='')}",
+                "path": "/tessaro",
+                "headers": {"x-tessaro-path": path, "content-type": content_type, **headers},
+            }
+        }
+        data = body if isinstance(body, bytes) or body is None else json.dumps(body)
+
+        users_main.command_tracker.start_timeline()
+        try:
+            payload, status, _headers = users_main.main(context, data)
+            if not isinstance(payload, (str, bytes)):
+                # Streamed responses (exports) only do their work when consumed.
+                for _chunk in payload:
+                    pass
+        finally:
+            timeline = users_main.command_tracker.stop_timeline()
+        return status, len(timeline)
+
+
+class HttpTarget:
+    round_trips_available = False
+
+    def __init__(self, base_url: str):
+        parsed = urlparse(base_url)
+        connection_class = http.client.HTTPSConnection if parsed.scheme == "https" else http.client.HTTPConnection
+        self.connection = connection_class(parsed.netloc, timeout=30)
+        self.prefix = parsed.path.rstrip("/")
+
+    def quiet(self):
+        return contextlib.nullcontext()
+
+    def call(self, method: str, path: str, body: Any, headers: Dict[str, str]) -> Tuple[int, Optional[int]]:
+        # Mirrors fissionFetch in src/server/lib/fission-client.ts.
+        url = f"{self.prefix}/tessaro?__path={quote(path, safe='')}"
+        headers = {"x-tessaro-path": path, "accept": "application/json", **headers}
+        payload = None
+        if isinstance(body, bytes):
+            payload = body
+            headers["content-type"] = "image/png"
+        elif body is not None:
+            payload = json.dumps(body).encode("utf-8")
+            headers["content-type"] = "application/json"
+        self.connection.request(method, url, body=payload, headers=headers)
+        response = self.connection.getresponse()
+        response.read()
+        return response.status, None
+
+
+def run_scenario(targets: List[Any], scenario: Scenario, state: Dict[str, Any], iterations: int, warmup: int) -> Dict[str, Any]:
+    """Run ``scenario`` with one worker thread per target.
+
+    Warmup runs sequentially on the first target; the timed iterations are then
+    shared out between the workers. Each worker gets its own shallow copy of
+    ``state`` because ``prepare`` stashes per-iteration values in it.
+    """
+    samples: List[float] = []
+    round_trips: List[int] = []
+    # Shed and deadline-exceeded counts are always reported so runs compare cleanly.
+    statuses: Dict[str, int] = {"429": 0, "504": 0}
+    lock = threading.Lock()
+    indexes = iter(range(warmup, warmup + iterations))
+
+    def call(target, worker_state: Dict[str, Any], index: int) -> Tuple[float, int, Optional[int]]:
+        if scenario.prepare is not None:
+            scenario.prepare(worker_state, index)
+        path = scenario.path(worker_state, index)
+        body = scenario.body(worker_state, index) if scenario.body is not None else None
+
+        started = time.perf_counter()
+        status, commands = target.call(scenario.method, path, body, scenario.headers)
+        return (time.perf_counter() - started) * 1000, status, commands
+
+    def worker(target) -> None:
+        worker_state = dict(state)
+        while True:
+            with lock:
+                index = next(indexes, None)
+            if index is None:
+                return
+            elapsed_ms, status, commands = call(target, worker_state, index)
+            with lock:
+                samples.append(elapsed_ms)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                if commands is not None:
+                    round_trips.append(commands)
+
+    with targets[0].quiet():
+        for index in range(warmup):
+            call(targets[0], state, index)
+
+        threads = [threading.Thread(target=worker, args=(target,), daemon=True) for target in targets]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall_seconds = time.perf_counter() - started
+
+    result = {"method": scenario.method, **summarize(samples, wall_seconds), "statuses": statuses}
+    result["mongo_round_trips"] = round(sum(round_trips) / len(round_trips), 2) if round_trips else None
+    return result
+
+
+def compare(previous_path: str, results: Dict[str, Any]) -> None:
+    with open(previous_path, encoding="utf-8") as handle:
+        previous = json.load(handle)
+    print(f"{'route':<28}{'p50 ms':>18}{'p99 ms':>18}{'round trips':>16}")
+    for name, current in results["routes"].items():
+        before = previous.get("routes", {}).get(name)
+        if not before or not current.get("iterations"):
+            continue
+        print(
+            f"{name:<28}"
+            f"{before['p50_ms']:>8} -> {current['p50_ms']:<7}"
+            f"{before['p99_ms']:>8} -> {current['p99_ms']:<7}"
+            f"{str(before.get('mongo_round_trips')):>7} -> {str(current.get('mongo_round_trips')):<6}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017", help="scratch MongoDB used for seeding and in-process runs")
+    parser.add_argument("--database", default="tessaro_bench")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="1k")
+    parser.add_argument("--organizations", type=int, help="override the organization count for --scale")
+    parser.add_argument("--services", type=int, help="override the service count for --scale")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse an already seeded database")
+    parser.add_argument("--mode", choices=["inprocess", "http"], default="inprocess")
+    parser.add_argument("--base-url", default="http://localhost:8888", help="function or router URL for --mode http")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--bulk-iterations", type=int, default=10, help="iterations for full listings and counts")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=1, help="worker threads per scenario (one HTTP connection each)")
+    parser.add_argument("--route", action="append", help="only run routes with this name prefix (repeatable)")
+    parser.add_argument("--seed", type=int, default=1234, help="random seed for the generated data")
+    parser.add_argument("--output", help="write results as JSON to this path")
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    parser.add_argument("--show-logs", action="store_true", help="keep the function's own logging on stdout")
+    parser.add_argument(
+        "--client-profile",
+        choices=sorted(users_main.CLIENT_PROFILE_DEFAULTS),
+        default=users_main.CLIENT_PROFILE_DEFAULT,
+        help="Mongo client profile for in-process runs (pool sizing and compression)",
+    )
+    parser.add_argument(
+        "--listing-client-profile",
+        choices=sorted(users_main.CLIENT_PROFILE_DEFAULTS),
+        help="separate client profile for listings and exports, like MONGO_LISTING_CLIENT_PROFILE (default: share the --client-profile client)",
+    )
+    args = parser.parse_args()
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+
+    scale = dict(SCALES[args.scale])
+    if args.organizations:
+        scale["organizations"] = args.organizations
+    if args.services:
+        scale["services"] = args.services
+
+    # create_client registers each client's PoolMonitor, so /tessaro/pool and
+    # the results report the same per-role numbers as the deployed function.
+    client = users_main.create_client(args.uri, {}, args.client_profile, "primary")
+    listing_profile = args.listing_client_profile or args.client_profile
+    listing_client = client
+    if listing_profile != args.client_profile:
+        listing_client = users_main.create_client(args.uri, {}, listing_profile, "listing")
+    database = client[args.database]
+
+    seed_started = time.perf_counter()
+    state = load_state(database) if args.skip_seed else seed(database, scale, random.Random(args.seed))
+    seed_seconds = round(time.perf_counter() - seed_started, 2)
+    state["database"] = database
+
+    if args.mode == "inprocess":
+        # One shared target: the function is called directly, so workers contend
+        # for its admission slots and Mongo pool exactly like concurrent invocations.
+        targets: List[Any] = [InProcessTarget(client, listing_client, args.database, args.show_logs)] * args.concurrency
+    else:
+        targets = [HttpTarget(args.base_url) for _ in range(args.concurrency)]
+
+    routes: Dict[str, Any] = {}
+    for scenario in build_scenarios():
+        if args.route and not any(scenario.name.startswith(prefix) for prefix in args.route):
+            continue
+        iterations = args.bulk_iterations if scenario.bulk else args.iterations
+        routes[scenario.name] = run_scenario(targets, scenario, state, iterations, args.warmup)
+        print(f"{scenario.name:<28}{json.dumps(routes[scenario.name])}")
+
+    results = {
+        "revision": git_revision(),
+        "recorded_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+        "mode": args.mode,
+        "concurrency": args.concurrency,
+        "client_profile": args.client_profile,
+        "listing_client_profile": listing_profile,
+        "scale": {"name": args.scale, **scale, "seed_seconds": None if args.skip_seed else seed_seconds},
+        "routes": routes,
+        "pool": users_main.pool_snapshot(),
+    }
+    print(f"{'pool':<28}{json.dumps(results['pool'])}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, indent=2)
+    if args.compare:
+        compare(args.compare, results)
+
+    if listing_client is not client:
+        listing_client.close()
+    client.close()
+
+
+if __name__ == "__main__":
+    main()
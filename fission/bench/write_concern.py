@@ -0,0 +1,69 @@
+"""Compare write latency across the users function's write-concern tiers.
+
+Runs the same single-document upsert (the shape used by the metric handlers)
+against each tier and prints p50/p99 latency in milliseconds. Point it at a
+scratch database; the benchmark collection is dropped afterwards.
+
+    python fission/bench/write_concern.py --uri mongodb://localhost:27017 --iterations 2000
+"""
+
+import argparse
+import json
+import time
+
+from common import summarize
+
+from users import main as users_main  # noqa: E402  (adds the vendored driver to sys.path)
+
+from pymongo import MongoClient  # noqa: E402
+
+
+def run_tier(collection, iterations):
+    samples = []
+    for index in range(iterations):
+        key = f"bench-{index % 64}"
+        started = time.perf_counter()
+        collection.update_one(
+            {"_id": key, "kind": "number"},
+            {"$inc": {"value": 1}, "$set": {"key": key, "kind": "number"}},
+            upsert=True,
+        )
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017")
+    parser.add_argument("--database", default="tessaro_bench")
+    parser.add_argument("--iterations", type=int, default=1000)
+    parser.add_argument(
+        "--tier",
+        action="append",
+        help="tier=spec override, e.g. metrics=w=0 (repeatable); defaults to the function's tiers",
+    )
+    args = parser.parse_args()
+
+    tiers = dict(users_main.WRITE_TIER_DEFAULTS)
+    tiers.setdefault("fire-and-forget", "w=0")
+    for override in args.tier or []:
+        name, _, spec = override.partition("=")
+        tiers[name] = spec
+
+    client = MongoClient(args.uri)
+    collection = client[args.database]["write_concern_bench"]
+    results = {}
+    try:
+        for name, spec in tiers.items():
+            tiered = collection.with_options(write_concern=users_main.parse_write_concern(spec))
+            run_tier(tiered, min(50, args.iterations))  # warm the pool and the documents
+            results[name] = {"write_concern": spec, **summarize(run_tier(tiered, args.iterations))}
+    finally:
+        collection.drop()
+        client.close()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
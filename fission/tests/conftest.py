@@ -0,0 +1,9 @@
+import os
+import sys
+from pathlib import Path
+
+FISSION_DIR = Path(__file__).resolve().parent.parent
+# Tests never talk to MongoDB; keep the function from opening a client on import.
+os.environ.setdefault("MONGO_PREWARM", "false")
+if str(FISSION_DIR) not in sys.path:
+    sys.path.insert(0, str(FISSION_DIR))
@@ -0,0 +1,96 @@
+import threading
+import time
+from typing import List
+
+import pytest
+
+from users import main as users_main
+
+WAIT_SECONDS = 5
+
+
+def make_controller() -> users_main.AdmissionController:
+    # One shared slot so every other request has to queue behind the holder.
+    return users_main.AdmissionController(
+        1,
+        {
+            users_main.ADMISSION_AUTH: (0, 1, 4),
+            users_main.ADMISSION_STANDARD: (1, 1, 4),
+            users_main.ADMISSION_BULK: (2, 1, 1),
+        },
+    )
+
+
+def wait_for_queued(controller: users_main.AdmissionController, route_class: str, count: int) -> None:
+    deadline = time.monotonic() + WAIT_SECONDS
+    while controller.snapshot()["classes"][route_class]["queued"] < count:
+        assert time.monotonic() < deadline, f"{route_class} never reached {count} queued"
+        time.sleep(0.001)
+
+
+def start_waiter(controller: users_main.AdmissionController, route_class: str, admitted: List[str]) -> threading.Thread:
+    def run() -> None:
+        controller.acquire(route_class, WAIT_SECONDS)
+        admitted.append(route_class)
+        controller.release(route_class)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_higher_priority_waiter_is_admitted_first():
+    controller = make_controller()
+    controller.acquire(users_main.ADMISSION_BULK, 0)
+    admitted: List[str] = []
+
+    # The standard request queues first; the auth request still overtakes it.
+    standard = start_waiter(controller, users_main.ADMISSION_STANDARD, admitted)
+    wait_for_queued(controller, users_main.ADMISSION_STANDARD, 1)
+    auth = start_waiter(controller, users_main.ADMISSION_AUTH, admitted)
+    wait_for_queued(controller, users_main.ADMISSION_AUTH, 1)
+
+    controller.release(users_main.ADMISSION_BULK)
+    standard.join(WAIT_SECONDS)
+    auth.join(WAIT_SECONDS)
+
+    assert admitted == [users_main.ADMISSION_AUTH, users_main.ADMISSION_STANDARD]
+    assert controller.snapshot()["active"] == 0
+
+
+def test_full_queue_sheds_immediately():
+    controller = make_controller()
+    controller.acquire(users_main.ADMISSION_BULK, 0)
+    admitted: List[str] = []
+    waiter = start_waiter(controller, users_main.ADMISSION_BULK, admitted)
+    wait_for_queued(controller, users_main.ADMISSION_BULK, 1)
+
+    started = time.monotonic()
+    with pytest.raises(users_main.AdmissionRejected) as error:
+        controller.acquire(users_main.ADMISSION_BULK, WAIT_SECONDS)
+    assert time.monotonic() - started < 1
+    assert error.value.route_class == users_main.ADMISSION_BULK
+    assert controller.snapshot()["classes"][users_main.ADMISSION_BULK]["shed"] == 1
+
+    controller.release(users_main.ADMISSION_BULK)
+    waiter.join(WAIT_SECONDS)
+    assert admitted == [users_main.ADMISSION_BULK]
+
+
+def test_queue_wait_past_deadline_times_out_and_restores_counters():
+    controller = make_controller()
+    controller.acquire(users_main.ADMISSION_BULK, 0)
+
+    with pytest.raises(users_main.AdmissionRejected):
+        controller.acquire(users_main.ADMISSION_STANDARD, 0.05)
+
+    snapshot = controller.snapshot()
+    standard = snapshot["classes"][users_main.ADMISSION_STANDARD]
+    assert snapshot["active"] == 1
+    assert (standard["active"], standard["queued"], standard["timed_out"], standard["admitted"]) == (0, 0, 1, 0)
+
+    # The abandoned ticket must not block the next request once the slot frees.
+    controller.release(users_main.ADMISSION_BULK)
+    controller.acquire(users_main.ADMISSION_STANDARD, 0)
+    controller.release(users_main.ADMISSION_STANDARD)
+    assert controller.snapshot()["active"] == 0
@@ -0,0 +1,60 @@
+from typing import Any, Dict, Optional
+from urllib.parse import quote
+
+import pytest
+
+from users import main as users_main
+
+
+def make_request(
+    path: str,
+    headers: Optional[Dict[str, str]] = None,
+    via_header: bool = True,
+    method: str = "GET",
+) -> users_main.Request:
+    request: Dict[str, Any] = {
+        "method": method,
+        "url": f"http://router.fission.svc.cluster.local/tessaro?__path={quote(path, safe='')}",
+        "path": "/tessaro",
+        "headers": dict(headers or {}),
+    }
+    if via_header:
+        request["headers"]["X-Tessaro-Path"] = path
+    return users_main.Request({"request": request})
+
+
+@pytest.mark.parametrize("via_header", [True, False])
+def test_segments_are_unquoted_once(via_header):
+    # fission-client.ts encodes ids with encodeURIComponent.
+    request = make_request(f"/tessaro/users/{quote('first last+%41', safe='')}", via_header=via_header)
+    assert request.segments == ["tessaro", "users", "first last+%41"]
+
+
+@pytest.mark.parametrize("via_header", [True, False])
+def test_encoded_slash_stays_inside_its_segment(via_header):
+    request = make_request(f"/tessaro/users/{quote('org/user', safe='')}/avatar", via_header=via_header)
+    assert request.segments == ["tessaro", "users", "org/user", "avatar"]
+    _route, params = users_main.ROUTES.resolve("GET", request.segments)
+    assert params == {"user_id": "org/user"}
+
+
+@pytest.mark.parametrize("via_header", [True, False])
+def test_query_values_are_decoded_once(via_header):
+    email = "first.last+tag@example.com"
+    request = make_request(f"/tessaro/users?email={quote(email, safe='')}&note=%2541", via_header=via_header)
+    assert request.segments == ["tessaro", "users"]
+    assert users_main.first_value(request.query, "email") == email
+    assert users_main.first_value(request.query, "note") == "%41"
+
+
+def test_first_value_skips_blank_entries():
+    assert users_main.first_value({"since": ["  ", " 2026-01-01 "]}, "since") == "2026-01-01"
+    assert users_main.first_value({}, "since") is None
+
+
+def test_header_lookup_ignores_case():
+    request = make_request("/tessaro/users/u1", {"If-Match": '"3"', "accept-encoding": "gzip"})
+    assert request.header("if-match") == '"3"'
+    assert request.header("Accept-Encoding") == "gzip"
+    assert request.header("range") is None
+    assert users_main.parse_expected_version(request.header, {}) == 3
@@ -0,0 +1,147 @@
+import base64
+import datetime as dt
+import json
+from typing import Any, Dict, List
+
+import pytest
+
+from users import main as users_main
+
+UPPER = dt.datetime(2026, 3, 1, 12, 0, 0, tzinfo=dt.timezone.utc)
+TIED = UPPER - dt.timedelta(minutes=5)
+
+
+def raw_token(state: Any) -> str:
+    return base64.urlsafe_b64encode(json.dumps(state).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = doc.get(key)
+            for operator, operand in condition.items():
+                if operator == "$gt" and not value > operand:
+                    return False
+                if operator == "$lte" and not value <= operand:
+                    return False
+        elif doc.get(key) != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs: List[Dict[str, Any]]):
+        self.docs = docs
+
+    def sort(self, keys):
+        for field, _direction in reversed(keys):
+            self.docs.sort(key=lambda doc: doc[field])
+        return self
+
+    def limit(self, count: int):
+        self.docs = self.docs[:count]
+        return self
+
+    def __iter__(self):
+        return iter(self.docs)
+
+
+class FakeCollection:
+    """Just enough of ``Collection.find`` for the keyset queries."""
+
+    def __init__(self, docs: List[Dict[str, Any]]):
+        self.docs = docs
+        self.queries: List[Dict[str, Any]] = []
+
+    def find(self, query: Dict[str, Any]):
+        self.queries.append(query)
+        return FakeCursor([doc for doc in self.docs if matches(doc, query)])
+
+
+def test_first_sync_without_token_starts_from_the_beginning():
+    state = users_main.decode_sync_token(None)
+    assert state == {"changes": [None, None], "deleted": [None, None]}
+    assert users_main.decode_sync_token("") == state
+    assert users_main.keyset_query("updated_at", state["changes"], UPPER) == {
+        "$and": [{}, {"updated_at": {"$lte": UPPER}}]
+    }
+
+
+def test_bare_iso_since_is_an_exclusive_watermark():
+    state = users_main.decode_sync_token("2026-03-01T11:00:00Z")
+    watermark = dt.datetime(2026, 3, 1, 11, 0, 0, tzinfo=dt.timezone.utc)
+    assert state == {"changes": [watermark, None], "deleted": [watermark, None]}
+    assert users_main.keyset_query("updated_at", state["changes"], UPPER) == {
+        "$and": [{"updated_at": {"$gt": watermark}}, {"updated_at": {"$lte": UPPER}}]
+    }
+
+
+def test_token_round_trips_positions():
+    state = {"changes": [TIED, "user-b"], "deleted": [None, None]}
+    assert users_main.decode_sync_token(users_main.encode_sync_token(state)) == state
+
+
+def test_paging_through_equal_updated_at_visits_every_document_once():
+    docs = [{"_id": f"user-{letter}", "updated_at": TIED} for letter in "ecadb"]
+    docs.append({"_id": "user-late", "updated_at": UPPER + dt.timedelta(seconds=1)})
+    collection = FakeCollection(docs)
+
+    seen: List[str] = []
+    position = users_main.decode_sync_token(None)["changes"]
+    pages = 0
+    while True:
+        page, position, has_more = users_main.read_keyset_page(collection, {}, "updated_at", position, UPPER, 2)
+        seen.extend(doc["_id"] for doc in page)
+        pages += 1
+        # Tokens must survive the trip to the client between pages.
+        token = users_main.encode_sync_token({"changes": position, "deleted": [None, None]})
+        position = users_main.decode_sync_token(token)["changes"]
+        if not has_more:
+            break
+
+    assert seen == ["user-a", "user-b", "user-c", "user-d", "user-e"]
+    assert pages == 3
+    assert position == [UPPER, None]
+
+
+def test_token_newer_than_upper_keeps_its_position():
+    collection = FakeCollection([{"_id": "user-a", "updated_at": UPPER}])
+    ahead = [UPPER + dt.timedelta(seconds=30), "user-z"]
+
+    page, position, has_more = users_main.read_keyset_page(collection, {}, "updated_at", ahead, UPPER, 10)
+
+    assert (page, position, has_more) == ([], ahead, False)
+    assert collection.queries == []
+
+
+@pytest.mark.parametrize(
+    "token",
+    [
+        "not a timestamp",
+        "2026-13-45",
+        raw_token({"changes": ["yesterday", None], "deleted": [None, None]}),
+        raw_token({"changes": [], "deleted": [None, None]}),
+        raw_token({"changes": None, "deleted": [None, None]}),
+        raw_token(["changes", "deleted"]),
+    ],
+)
+def test_malformed_tokens_are_rejected(token):
+    with pytest.raises(users_main.ValidationError) as error:
+        users_main.decode_sync_token(token)
+    assert error.value.status == 400
+
+
+def test_token_older_than_deletion_retention_must_resync(monkeypatch):
+    monkeypatch.setenv("TESSARO_DELETION_RETENTION_SECONDS", "3600")
+    stale = users_main.utc_now() - dt.timedelta(hours=2)
+    token = users_main.encode_sync_token({"changes": [stale, None], "deleted": [stale, None]})
+
+    with pytest.raises(users_main.ValidationError) as error:
+        users_main.handle_changes("users", {"since": [token]})
+    assert error.value.status == 410
@@ -1,33 +1,588 @@
+import contextlib
+import cProfile
 import datetime as dt
+import base64
+import collections
+import functools
 import hashlib
+import itertools
 import json
 import os
+import pstats
+import random
 import secrets
 import sys
+import threading
+import time
+import tracemalloc
 import uuid
+import zlib
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
-from urllib.parse import parse_qs, quote_plus, urlparse
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qs, quote_plus, unquote, urlsplit
 
 try:
+    from flask import Response as FlaskResponse  # type: ignore
+    from flask import has_request_context  # type: ignore
     from flask import request as flask_request  # type: ignore
 except ImportError:  # pragma: no cover
+    FlaskResponse = None  # type: ignore
     flask_request = None  # type: ignore
+    has_request_context = None  # type: ignore
 
 VENDOR_DIR = Path(__file__).resolve().parent / "vendor"
 if VENDOR_DIR.exists():
     sys.path.insert(0, str(VENDOR_DIR))
 
-from pymongo import MongoClient, ReturnDocument
+import bson
+from bson import json_util
+from bson.codec_options import CodecOptions
+from bson.objectid import ObjectId
+from bson.raw_bson import RawBSONDocument
+from gridfs import GridFSBucket, NoFile
+from pymongo import MongoClient, ReturnDocument, monitoring
+from pymongo import timeout as operation_timeout
 from pymongo.collection import Collection
-from pymongo.errors import DuplicateKeyError, PyMongoError
+from pymongo.client_session import ClientSession
+from pymongo.errors import ConfigurationError, DuplicateKeyError, InvalidOperation, OperationFailure, PyMongoError
+from pymongo.operations import DeleteMany, DeleteOne, UpdateOne
+from pymongo.read_preferences import make_read_preference, read_pref_mode_from_name
+from pymongo.write_concern import WriteConcern
 
 JSON_HEADERS = {"content-type": "application/json"}
+DEADLINE_HEADER = "x-tessaro-deadline-ms"
+# Kept below the Fission functionTimeout (10s) so a slow query fails with a 504
+# instead of the pod being killed mid-request.
+DEFAULT_DEADLINE_MS = 8000
+
+# Admission classes, served in priority order (lowest first) when slots free
+# up. Values are (priority, max concurrent, max queued); per-class overrides use
+# TESSARO_ADMISSION_<CLASS>="<concurrency>:<queue>" and the shared slot count
+# TESSARO_ADMISSION_SLOTS.
+ADMISSION_AUTH = "auth"
+ADMISSION_STANDARD = "standard"
+ADMISSION_BULK = "bulk"
+ADMISSION_DEFAULTS = {
+    ADMISSION_AUTH: (0, 8, 16),
+    ADMISSION_STANDARD: (1, 4, 8),
+    ADMISSION_BULK: (2, 2, 4),
+}
+DEFAULT_ADMISSION_SLOTS = 8
+ADMISSION_RETRY_AFTER_SECONDS = 1
+
+# On-demand profiling: callers presenting TESSARO_PROFILE_TOKEN in
+# x-tessaro-profile get one invocation wrapped in cProfile and tracemalloc.
+# TESSARO_PROFILE_SAMPLE_RATE (0-1) additionally profiles a random share of
+# traffic; both are limited to one profile per TESSARO_PROFILE_MIN_INTERVAL_SECONDS.
+PROFILE_HEADER = "x-tessaro-profile"
+DEFAULT_PROFILE_TOP_N = 25
+DEFAULT_PROFILE_MIN_INTERVAL_SECONDS = 10
+
+# Bulk export. Cursors hand back RawBSONDocument batches so the raw format is
+# a byte-for-byte passthrough and NDJSON only decodes one document at a time.
+DEFAULT_EXPORT_COLLECTIONS = "users,organizations,services,metrics"
+DEFAULT_EXPORT_BATCH_SIZE = 5000
+EXPORT_CHUNK_BYTES = 64 * 1024
+RAW_CODEC_OPTIONS = CodecOptions(document_class=RawBSONDocument)
+DECODE_CODEC_OPTIONS = CodecOptions(tz_aware=True, tzinfo=dt.timezone.utc)
+
+# Delta sync. Changes are read in (updated_at, _id) order and deletes are
+# recorded as tombstones in DELETIONS_COLLECTION. The upper watermark trails
+# the clock by SYNC_SAFETY_LAG_SECONDS so writes still in flight are not
+# skipped by the next token. Tombstones expire after
+# TESSARO_DELETION_RETENTION_SECONDS through a TTL index.
+SYNC_RESOURCES = ("users", "organizations", "services")
+DELETIONS_COLLECTION = "deletions"
+DELETIONS_TTL_INDEX = "deleted_at_ttl"
+DEFAULT_DELETION_RETENTION_SECONDS = 30 * 24 * 60 * 60
+DEFAULT_SYNC_LIMIT = 500
+MAX_SYNC_LIMIT = 5000
+SYNC_SAFETY_LAG_SECONDS = 2
+AVATAR_BUCKET = "avatars"
+AVATAR_CONTENT_TYPES = frozenset({"image/png", "image/jpeg", "image/gif", "image/webp"})
+DEFAULT_AVATAR_MAX_BYTES = 1024 * 1024
+DEFAULT_AVATAR_CACHE_CONTROL = "public, max-age=300"
 SECRET_DIRS = [Path("/secrets/mongodb-auth"), Path("/secrets/default/mongodb-auth")]
 
+# Read preference profiles. Single-document lookups and read-your-own-write
+# paths stay on the primary; listings, counts and metric reads may be served by
+# secondaries (bounded by MONGO_MAX_STALENESS_SECONDS) so replica set members
+# can absorb dashboard traffic.
+READ_PROFILE_PRIMARY = "primary"
+READ_PROFILE_LISTING = "listing"
+READ_PROFILE_COUNT = "count"
+READ_PROFILE_METRICS = "metrics"
+READ_PROFILE_SYNC = "sync"
+READ_PROFILE_DEFAULTS = {
+    READ_PROFILE_PRIMARY: "primary",
+    READ_PROFILE_LISTING: "secondaryPreferred",
+    READ_PROFILE_COUNT: "secondaryPreferred",
+    READ_PROFILE_METRICS: "secondaryPreferred",
+    # Delta sync watermarks assume every write older than the safety lag is
+    # visible; only move this off the primary if replication lag stays below it.
+    READ_PROFILE_SYNC: "primary",
+}
+DEFAULT_MAX_STALENESS_SECONDS = 90
+
+# Write concern tiers per operation class. Metric counters and timestamps only
+# need a single acknowledgement (or none at all), whereas identity data must
+# survive a failover. Each tier is overridable via MONGO_WRITE_CONCERN_<TIER>
+# using comma-separated ``w``/``j``/``wtimeout`` pairs, e.g. ``w=0``.
+WRITE_TIER_METRICS = "metrics"
+WRITE_TIER_CATALOG = "catalog"
+WRITE_TIER_IDENTITY = "identity"
+WRITE_TIER_DEFAULTS = {
+    WRITE_TIER_METRICS: "w=1",
+    WRITE_TIER_CATALOG: "w=majority",
+    WRITE_TIER_IDENTITY: "w=majority,j=true",
+}
+
+# Mongo client profiles: pool sizing, idle/queue timeouts and wire compression.
+# The main client serves point reads and writes; full listings, service
+# queries and exports go through a second client whose replies are large
+# enough for zlib to pay off. Both sit behind admission control, so pools are
+# sized a little above the slots that can reach them. Each profile is tunable
+# via MONGO_CLIENT_OPTIONS_<PROFILE> (``-`` becomes ``_``) using the same
+# comma-separated ``key=value`` form, e.g. ``maxPoolSize=16,minPoolSize=8``.
+CLIENT_PROFILE_DEFAULT = "default"
+CLIENT_PROFILE_LOW_LATENCY = "low-latency"
+CLIENT_PROFILE_BULK = "bulk"
+CLIENT_PROFILE_DEFAULTS = {
+    CLIENT_PROFILE_DEFAULT: "",
+    CLIENT_PROFILE_LOW_LATENCY: "maxPoolSize=12,minPoolSize=4,maxIdleTimeMS=600000,waitQueueTimeoutMS=1000",
+    CLIENT_PROFILE_BULK: (
+        "maxPoolSize=4,minPoolSize=1,maxIdleTimeMS=120000,waitQueueTimeoutMS=5000,"
+        "compressors=zlib,zlibCompressionLevel=1"
+    ),
+}
+CLIENT_INT_OPTIONS = {
+    "maxPoolSize": 0,
+    "minPoolSize": 0,
+    "maxConnecting": 1,
+    "maxIdleTimeMS": 1,
+    "waitQueueTimeoutMS": 1,
+}
+# Only zlib is backed by the standard library; snappy and zstd need packages
+# that are not vendored.
+CLIENT_COMPRESSORS = ("zlib",)
+POOL_WAIT_SAMPLES = 1024
+
 _client: Optional[MongoClient] = None
 _database = None
+_listing_client: Optional[MongoClient] = None
+_listing_database = None
+_client_lock = threading.Lock()
+_pool_monitors: Dict[str, "PoolMonitor"] = {}
 _indexes_ready = False
+_read_preferences: Dict[str, Any] = {}
+_write_concerns: Dict[str, WriteConcern] = {}
+_collections: Dict[Tuple[str, str, Optional[str]], Collection] = {}
+_client_bulk_write_supported: Optional[bool] = None
+
+
+class CommandTracker(monitoring.CommandListener):
+    """Remembers the in-flight Mongo command per thread so timeouts can name it.
+
+    While a timeline is being recorded (see ``start_timeline``) every command is
+    also appended with its start offset and duration.
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+
+    def reset(self) -> None:
+        self._local.current = None
+
+    def current(self) -> Optional[str]:
+        return getattr(self._local, "current", None)
+
+    def start_timeline(self) -> None:
+        self._local.timeline = []
+        self._local.timeline_started = time.perf_counter()
+
+    def stop_timeline(self) -> List[Dict[str, Any]]:
+        timeline = getattr(self._local, "timeline", None) or []
+        self._local.timeline = None
+        return timeline
+
+    def _timeline_entry(self, request_id: int) -> Optional[Dict[str, Any]]:
+        for entry in reversed(getattr(self._local, "timeline", None) or []):
+            if entry["request_id"] == request_id:
+                return entry
+        return None
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        target = event.command.get(event.command_name)
+        if not isinstance(target, str):
+            target = event.command.get("collection")
+        self._local.current = f"{event.command_name} {target}" if isinstance(target, str) else event.command_name
+
+        timeline = getattr(self._local, "timeline", None)
+        if timeline is not None:
+            timeline.append({
+                "request_id": event.request_id,
+                "command": self._local.current,
+                "offset_ms": round((time.perf_counter() - self._local.timeline_started) * 1000, 3),
+                "duration_ms": None,
+                "ok": None,
+            })
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._local.current = None
+        entry = self._timeline_entry(event.request_id)
+        if entry is not None:
+            entry["duration_ms"] = event.duration_micros / 1000
+            entry["ok"] = True
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        entry = self._timeline_entry(event.request_id)
+        if entry is not None:
+            entry["duration_ms"] = event.duration_micros / 1000
+            entry["ok"] = False
+
+
+command_tracker = CommandTracker()
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Counts connection pool events and keeps recent checkout wait times.
+
+    Checkout waits include time queued behind ``maxPoolSize`` and time spent
+    opening a new connection, which is what pool sizing should be based on.
+    """
+
+    def __init__(self, profile: str, options: Dict[str, Any]) -> None:
+        self.profile = profile
+        self.options = options
+        self._lock = threading.Lock()
+        self._waits_ms: "collections.deque[float]" = collections.deque(maxlen=POOL_WAIT_SAMPLES)
+        self._counters = {"checkouts": 0, "checked_in": 0, "created": 0, "closed": 0, "cleared": 0}
+        self._failures: Dict[str, int] = {}
+        self._max_wait_ms = 0.0
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            waits = sorted(self._waits_ms)
+            counters = dict(self._counters)
+            failures = dict(self._failures)
+            max_wait_ms = self._max_wait_ms
+
+        def percentile(fraction: float) -> Optional[float]:
+            if not waits:
+                return None
+            return round(waits[min(len(waits) - 1, int(round(fraction * (len(waits) - 1))))], 3)
+
+        return {
+            "profile": self.profile,
+            "options": self.options,
+            "checkouts": counters["checkouts"],
+            "checkout_failures": failures,
+            "wait_ms": {"p50": percentile(0.5), "p99": percentile(0.99), "max": round(max_wait_ms, 3)},
+            "connections": {
+                "open": counters["created"] - counters["closed"],
+                "in_use": counters["checkouts"] - counters["checked_in"],
+                "created": counters["created"],
+                "closed": counters["closed"],
+            },
+            "cleared": counters["cleared"],
+        }
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent) -> None:
+        wait_ms = (event.duration or 0.0) * 1000
+        with self._lock:
+            self._counters["checkouts"] += 1
+            self._waits_ms.append(wait_ms)
+            self._max_wait_ms = max(self._max_wait_ms, wait_ms)
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent) -> None:
+        with self._lock:
+            self._failures[event.reason] = self._failures.get(event.reason, 0) + 1
+        print("[tessaro-api] connection checkout failed:", self.profile, event.reason, f"{(event.duration or 0) * 1000:.1f}ms")
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent) -> None:
+        self._count("checked_in")
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent) -> None:
+        self._count("created")
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent) -> None:
+        self._count("closed")
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent) -> None:
+        self._count("cleared")
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent) -> None:
+        pass
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent) -> None:
+        pass
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent) -> None:
+        pass
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent) -> None:
+        pass
+
+    def connection_check_out_started(self, event: monitoring.ConnectionCheckOutStartedEvent) -> None:
+        pass
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, message: str, route_class: str):
+        super().__init__(message)
+        self.route_class = route_class
+
+
+class AdmissionController:
+    """Bounded per-class concurrency with small priority-ordered queues.
+
+    A request runs when both a shared slot and a slot of its class are free and
+    no higher-priority (or earlier same-priority) eligible waiter is ahead of it.
+    Requests that find their class queue full are rejected immediately.
+    """
+
+    def __init__(self, total_slots: int, classes: Dict[str, Tuple[int, int, int]]):
+        self.total_slots = total_slots
+        self.classes = classes
+        self._condition = threading.Condition()
+        self._sequence = itertools.count()
+        self._waiters: List[Tuple[int, int, str]] = []
+        self._active_total = 0
+        self._stats = {
+            name: {"active": 0, "queued": 0, "admitted": 0, "shed": 0, "timed_out": 0}
+            for name in classes
+        }
+
+    def _has_capacity(self, route_class: str) -> bool:
+        _priority, max_concurrency, _max_queue = self.classes[route_class]
+        return self._active_total < self.total_slots and self._stats[route_class]["active"] < max_concurrency
+
+    def _next_eligible(self) -> Optional[Tuple[int, int, str]]:
+        for waiter in self._waiters:
+            if self._has_capacity(waiter[2]):
+                return waiter
+        return None
+
+    def _admit(self, route_class: str) -> None:
+        self._active_total += 1
+        self._stats[route_class]["active"] += 1
+        self._stats[route_class]["admitted"] += 1
+
+    def acquire(self, route_class: str, timeout: float) -> None:
+        priority, _max_concurrency, max_queue = self.classes[route_class]
+        stats = self._stats[route_class]
+
+        with self._condition:
+            if self._has_capacity(route_class) and not any(
+                waiter[0] <= priority and self._has_capacity(waiter[2]) for waiter in self._waiters
+            ):
+                self._admit(route_class)
+                return
+
+            if stats["queued"] >= max_queue:
+                stats["shed"] += 1
+                raise AdmissionRejected(f"{route_class} queue is full", route_class)
+
+            ticket = (priority, next(self._sequence), route_class)
+            self._waiters.append(ticket)
+            self._waiters.sort()
+            stats["queued"] += 1
+            deadline = time.monotonic() + max(timeout, 0)
+            try:
+                while self._next_eligible() != ticket:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        stats["timed_out"] += 1
+                        raise AdmissionRejected(f"{route_class} queue wait exceeded the request deadline", route_class)
+                    self._condition.wait(remaining)
+                self._admit(route_class)
+            finally:
+                self._waiters.remove(ticket)
+                stats["queued"] -= 1
+                self._condition.notify_all()
+
+    def release(self, route_class: str) -> None:
+        with self._condition:
+            self._active_total -= 1
+            self._stats[route_class]["active"] -= 1
+            self._condition.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._condition:
+            classes = {}
+            for name, (priority, max_concurrency, max_queue) in self.classes.items():
+                classes[name] = {
+                    "priority": priority,
+                    "max_concurrency": max_concurrency,
+                    "max_queue": max_queue,
+                    **self._stats[name],
+                }
+            return {"slots": self.total_slots, "active": self._active_total, "classes": classes}
+
+
+def load_admission_controller() -> AdmissionController:
+    raw_slots = os.environ.get("TESSARO_ADMISSION_SLOTS")
+    try:
+        total_slots = int(raw_slots) if raw_slots else DEFAULT_ADMISSION_SLOTS
+    except ValueError as error:
+        raise RuntimeError(f"Invalid TESSARO_ADMISSION_SLOTS: {raw_slots}") from error
+
+    classes: Dict[str, Tuple[int, int, int]] = {}
+    for name, (priority, max_concurrency, max_queue) in ADMISSION_DEFAULTS.items():
+        override = os.environ.get(f"TESSARO_ADMISSION_{name.upper()}")
+        if override:
+            try:
+                concurrency_text, _, queue_text = override.partition(":")
+                max_concurrency = int(concurrency_text)
+                max_queue = int(queue_text) if queue_text else max_queue
+            except ValueError as error:
+                raise RuntimeError(f"Invalid TESSARO_ADMISSION_{name.upper()}: {override}") from error
+        classes[name] = (priority, max_concurrency, max_queue)
+
+    return AdmissionController(total_slots, classes)
+
+
+admission = load_admission_controller()
+
+# Release callback for the admission slot held by the request on this thread;
+# make_stream takes it over so the slot lasts until the body is consumed.
+_pending_release = threading.local()
+
+
+class ReleasingStream:
+    """Streamed response body that runs ``release`` once it is exhausted, fails or is closed."""
+
+    def __init__(self, chunks: Iterable[bytes], release: Callable[[], None]) -> None:
+        self._release: Optional[Callable[[], None]] = release
+        self._chunks = iter(chunks)
+
+    def __iter__(self) -> "ReleasingStream":
+        return self
+
+    def __next__(self) -> bytes:
+        try:
+            return next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        # WSGI servers call close() even when the client goes away before the
+        # first chunk, which a generator's finally would never see.
+        release, self._release = self._release, None
+        if release is None:
+            return
+        try:
+            close = getattr(self._chunks, "close", None)
+            if close is not None:
+                close()
+        finally:
+            release()
+
+    __del__ = close
+
+
+class RequestProfiler:
+    """Wraps a single invocation in cProfile and tracemalloc when allowed."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._last_started = 0.0
+
+    def reason(self, presented_token: Optional[str]) -> Optional[str]:
+        if presented_token:
+            expected = read_secret_value("TESSARO_PROFILE_TOKEN")
+            # Compare bytes: compare_digest rejects non-ASCII str with TypeError.
+            if expected and secrets.compare_digest(presented_token.strip().encode("utf-8"), expected.encode("utf-8")):
+                return "header"
+            print("[tessaro-api] ignoring unauthorized profile request")
+
+        try:
+            sample_rate = float(os.environ.get("TESSARO_PROFILE_SAMPLE_RATE") or 0)
+        except ValueError:
+            sample_rate = 0.0
+        if sample_rate > 0 and random.random() < sample_rate:
+            return "sample"
+        return None
+
+    def run(self, reason: str, handler, *args):
+        try:
+            min_interval = float(os.environ.get("TESSARO_PROFILE_MIN_INTERVAL_SECONDS") or DEFAULT_PROFILE_MIN_INTERVAL_SECONDS)
+        except ValueError:
+            min_interval = DEFAULT_PROFILE_MIN_INTERVAL_SECONDS
+
+        now = time.monotonic()
+        # cProfile and tracemalloc are process-wide, so profile one request at a time.
+        if now - self._last_started < min_interval or not self._lock.acquire(blocking=False):
+            response = handler(*args)
+            return self._annotate(response, {PROFILE_HEADER: "skipped"}) if reason == "header" else response
+
+        try:
+            self._last_started = now
+            profile_id = uuid.uuid4().hex[:12]
+            started_tracing = not tracemalloc.is_tracing()
+            if started_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            command_tracker.start_timeline()
+            profile = cProfile.Profile()
+            wall_started = time.perf_counter()
+            try:
+                response = profile.runcall(handler, *args)
+            finally:
+                wall_ms = (time.perf_counter() - wall_started) * 1000
+                timeline = command_tracker.stop_timeline()
+                _current, peak = tracemalloc.get_traced_memory()
+                if started_tracing:
+                    tracemalloc.stop()
+        finally:
+            self._lock.release()
+
+        report = {
+            "profile_id": profile_id,
+            "reason": reason,
+            "wall_ms": round(wall_ms, 3),
+            "peak_alloc_bytes": peak,
+            "top_functions": self._top_functions(profile),
+            "mongo_commands": timeline,
+        }
+        print("[tessaro-api] profile", json.dumps(report))
+
+        if reason != "header":
+            return response
+        summary = f"id={profile_id};wall_ms={report['wall_ms']};peak_kb={peak // 1024};mongo_commands={len(timeline)}"
+        return self._annotate(response, {PROFILE_HEADER: summary})
+
+    @staticmethod
+    def _top_functions(profile: cProfile.Profile) -> List[Dict[str, Any]]:
+        try:
+            top_n = int(os.environ.get("TESSARO_PROFILE_TOP_N") or DEFAULT_PROFILE_TOP_N)
+        except ValueError:
+            top_n = DEFAULT_PROFILE_TOP_N
+
+        stats = pstats.Stats(profile).stats  # type: ignore[attr-defined]
+        ranked = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:top_n]
+        return [
+            {
+                "function": f"{Path(filename).name}:{line}({name})",
+                "calls": total_calls,
+                "total_ms": round(total_time * 1000, 3),
+                "cumulative_ms": round(cumulative_time * 1000, 3),
+            }
+            for (filename, line, name), (_primitive, total_calls, total_time, cumulative_time, _callers) in ranked
+        ]
+
+    @staticmethod
+    def _annotate(response, extra_headers: Dict[str, str]):
+        body, status, headers = response
+        return body, status, {**headers, **extra_headers}
+
+
+profiler = RequestProfiler()
 
 
 class ValidationError(Exception):
@@ -38,24 +593,47 @@ class ValidationError(Exception):
         self.status = status
 
 
-def make_response(status: int, body: Any) -> Tuple[str, int, Dict[str, str]]:
-    return json.dumps(body, default=_json_default), status, JSON_HEADERS
+def make_response(
+    status: int,
+    body: Any,
+    headers: Optional[Dict[str, str]] = None,
+) -> Tuple[str, int, Dict[str, str]]:
+    response_headers = {**JSON_HEADERS, **headers} if headers else JSON_HEADERS
+    return json.dumps(body, default=_json_default), status, response_headers
 
 
 def make_error(status: int, message: str) -> Tuple[str, int, Dict[str, str]]:
     return make_response(status, {"message": message})
 
 
+def deadline_exceeded(operation: Optional[str]) -> Tuple[str, int, Dict[str, str]]:
+    return make_response(504, {"message": "Deadline exceeded", "operation": operation or "server selection"})
+
+
 def no_content(status: int = 204) -> Tuple[str, int, Dict[str, str]]:
     return "", status, {}
 
 
+def make_stream(status: int, chunks: Iterable[bytes], headers: Dict[str, str]) -> Tuple[Any, int, Dict[str, str]]:
+    release = getattr(_pending_release, "callback", None)
+    if release is not None:
+        _pending_release.callback = None
+        chunks = ReleasingStream(chunks, release)
+    # Flask streams a Response wrapping a generator; other callers iterate the body themselves.
+    if FlaskResponse is not None:
+        return FlaskResponse(chunks, direct_passthrough=True), status, headers
+    return chunks, status, headers
+
+
 def _json_default(value: Any) -> Any:
     if isinstance(value, dt.datetime):
         if value.tzinfo is None:
             value = value.replace(tzinfo=dt.timezone.utc)
-        return value.isoformat()
-    return value
+        return value.isoformat(timespec="microseconds")
+    if isinstance(value, ObjectId):
+        return str(value)
+    # Binary, Decimal128, Timestamp, ... as extended JSON; raises TypeError otherwise.
+    return json_util.default(value)
 
 
 def read_secret_value(key: str) -> Optional[str]:
@@ -69,16 +647,45 @@ def read_secret_value(key: str) -> Optional[str]:
     return env_value.strip() if isinstance(env_value, str) and env_value.strip() else None
 
 
-def iso_now() -> str:
-    return dt.datetime.utcnow().replace(tzinfo=dt.timezone.utc).isoformat()
+def utc_now() -> dt.datetime:
+    # BSON dates carry milliseconds; truncate so responses built from the
+    # in-memory document match what a later read returns.
+    now = dt.datetime.now(dt.timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
 
 
-def get_database():
-    global _client, _database, _indexes_ready
+def parse_timestamp(value: Any) -> Optional[dt.datetime]:
+    """Coerce an ISO-8601 string (or datetime) into an aware UTC datetime.
+
+    Returns ``None`` for ``None``/blank values and raises ``ValueError`` for
+    strings that are not ISO-8601.
+    """
+    if value is None:
+        return None
+    if isinstance(value, dt.datetime):
+        parsed = value
+    elif isinstance(value, str):
+        text = value.strip()
+        if not text:
+            return None
+        parsed = dt.datetime.fromisoformat(text[:-1] + "+00:00" if text.endswith(("Z", "z")) else text)
+    else:
+        raise ValueError(f"unsupported timestamp value {value!r}")
+
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=dt.timezone.utc)
+    parsed = parsed.astimezone(dt.timezone.utc)
+    return parsed.replace(microsecond=parsed.microsecond // 1000 * 1000)
+
+
+def parse_timestamp_field(body: Dict[str, Any], key: str) -> Optional[dt.datetime]:
+    try:
+        return parse_timestamp(body.get(key))
+    except ValueError:
+        raise ValidationError(f"{key} must be an ISO-8601 timestamp")
 
-    if _database is not None:
-        return _database
 
+def mongo_uri() -> Tuple[str, Dict[str, str]]:
     username = read_secret_value("MONGO_INITDB_ROOT_USERNAME")
     password = read_secret_value("MONGO_INITDB_ROOT_PASSWORD")
 
@@ -105,21 +712,225 @@ def get_database():
     if query_params:
         encoded = "&".join(f"{key}={value}" for key, value in query_params.items())
         uri = f"{uri}?{encoded}"
+    return uri, query_params
+
+
+def parse_client_options(spec: str) -> Dict[str, Any]:
+    options: Dict[str, Any] = {}
+    for fragment in spec.split(","):
+        fragment = fragment.strip()
+        if not fragment:
+            continue
+        if "=" not in fragment:
+            raise ValueError(f"expected key=value, got {fragment!r}")
+        key, value = (part.strip() for part in fragment.split("=", 1))
+        if key in CLIENT_INT_OPTIONS:
+            number = int(value)
+            if number < CLIENT_INT_OPTIONS[key]:
+                raise ValueError(f"{key} must be at least {CLIENT_INT_OPTIONS[key]}")
+            options[key] = number
+        elif key == "compressors":
+            if value not in ("none", *CLIENT_COMPRESSORS):
+                raise ValueError(f"compressors must be one of none, {', '.join(CLIENT_COMPRESSORS)}")
+            if value != "none":
+                options[key] = value
+            else:
+                options.pop(key, None)
+        elif key == "zlibCompressionLevel":
+            level = int(value)
+            if not -1 <= level <= 9:
+                raise ValueError("zlibCompressionLevel must be between -1 and 9")
+            options[key] = level
+        else:
+            raise ValueError(f"unsupported client option {key!r}")
+
+    max_pool = options.get("maxPoolSize")
+    if max_pool and options.get("minPoolSize", 0) > max_pool:
+        raise ValueError("minPoolSize cannot exceed maxPoolSize")
+    return options
+
+
+def client_profile_options(profile: str) -> Dict[str, Any]:
+    if profile not in CLIENT_PROFILE_DEFAULTS:
+        raise RuntimeError(f"Unknown Mongo client profile: {profile} (expected one of {', '.join(CLIENT_PROFILE_DEFAULTS)})")
+
+    override = os.environ.get(f"MONGO_CLIENT_OPTIONS_{profile.upper().replace('-', '_')}", "")
+    spec = ",".join(part for part in (CLIENT_PROFILE_DEFAULTS[profile], override) if part)
+    try:
+        return parse_client_options(spec)
+    except ValueError as error:
+        raise RuntimeError(f"Invalid Mongo client profile {profile}: {spec} ({error})") from error
+
+
+def create_client(uri: str, uri_options: Dict[str, str], profile: str, role: str) -> MongoClient:
+    options = client_profile_options(profile)
+    # Options spelled out in MONGO_OPTIONS keep precedence over the profile.
+    explicit = {key.lower() for key in uri_options}
+    options = {key: value for key, value in options.items() if key.lower() not in explicit}
+
+    monitor = PoolMonitor(profile, options)
+    _pool_monitors[role] = monitor
+    print("[tessaro-api] Mongo client", role, "profile", profile, options)
+    return MongoClient(uri, event_listeners=[command_tracker, monitor], tz_aware=True, **options)
+
+
+def get_database():
+    global _client, _database, _listing_client, _listing_database, _indexes_ready
+
+    if _database is not None:
+        return _database
+
+    with _client_lock:
+        if _database is not None:
+            return _database
+
+        uri, uri_options = mongo_uri()
+        profile = os.environ.get("MONGO_CLIENT_PROFILE") or CLIENT_PROFILE_LOW_LATENCY
+        listing_profile = os.environ.get("MONGO_LISTING_CLIENT_PROFILE") or CLIENT_PROFILE_BULK
 
-    _client = MongoClient(uri)
-    database_name = os.environ.get("MONGO_DATABASE", "tessaro")
-    _database = _client[database_name]
+        client = create_client(uri, uri_options, profile, "primary")
+        database_name = os.environ.get("MONGO_DATABASE", "tessaro")
+        if listing_profile != profile:
+            _listing_client = create_client(uri, uri_options, listing_profile, "listing")
+            _listing_database = _listing_client[database_name]
+        _client = client
+        _database = client[database_name]
 
-    if not _indexes_ready:
-        ensure_indexes(_database)
-        _indexes_ready = True
+        if not _indexes_ready:
+            ensure_indexes(_database)
+            _indexes_ready = True
 
     return _database
 
 
-def get_collection(name: str) -> Collection:
+def get_listing_database():
     database = get_database()
-    return database[name]
+    return _listing_database if _listing_database is not None else database
+
+
+def pool_snapshot() -> Dict[str, Any]:
+    return {role: monitor.snapshot() for role, monitor in _pool_monitors.items()}
+
+
+def prewarm_clients() -> None:
+    """Build the Mongo clients while the function loads.
+
+    The driver then opens ``minPoolSize`` connections in the background, so the
+    first requests do not pay for TCP, TLS and authentication handshakes.
+    Disabled with MONGO_PREWARM=false.
+    """
+    if os.environ.get("MONGO_PREWARM", "true").strip().lower() in {"0", "false", "no", "off"}:
+        return
+    if not read_secret_value("MONGO_INITDB_ROOT_USERNAME"):
+        return
+
+    def warm() -> None:
+        try:
+            get_database()
+        except Exception as error:  # pylint: disable=broad-except
+            print("[tessaro-api] Mongo prewarm failed:", repr(error))
+
+    threading.Thread(target=warm, name="tessaro-mongo-prewarm", daemon=True).start()
+
+
+def read_preference_for(profile: str) -> Any:
+    cached = _read_preferences.get(profile)
+    if cached is not None:
+        return cached
+
+    if profile not in READ_PROFILE_DEFAULTS:
+        raise RuntimeError(f"Unknown read profile: {profile}")
+
+    mode_name = os.environ.get(f"MONGO_READ_PREFERENCE_{profile.upper()}") or READ_PROFILE_DEFAULTS[profile]
+    try:
+        mode = read_pref_mode_from_name(mode_name.strip())
+    except ValueError as error:
+        raise RuntimeError(f"Invalid read preference for {profile}: {mode_name}") from error
+
+    max_staleness = -1
+    if mode != read_pref_mode_from_name("primary"):
+        raw_staleness = os.environ.get("MONGO_MAX_STALENESS_SECONDS")
+        try:
+            max_staleness = int(raw_staleness) if raw_staleness else DEFAULT_MAX_STALENESS_SECONDS
+        except ValueError as error:
+            raise RuntimeError(f"Invalid MONGO_MAX_STALENESS_SECONDS: {raw_staleness}") from error
+
+    preference = make_read_preference(mode, None, max_staleness)
+    _read_preferences[profile] = preference
+    return preference
+
+
+def parse_write_concern(spec: str) -> WriteConcern:
+    options: Dict[str, Any] = {}
+    for fragment in spec.split(","):
+        fragment = fragment.strip()
+        if not fragment:
+            continue
+        if "=" not in fragment:
+            raise ValueError(f"expected key=value, got {fragment!r}")
+        key, value = (part.strip() for part in fragment.split("=", 1))
+        if key == "w":
+            options["w"] = int(value) if value.isdigit() else value
+        elif key == "j":
+            options["j"] = value.lower() in {"1", "true", "yes", "on"}
+        elif key == "wtimeout":
+            options["wtimeout"] = int(value)
+        else:
+            raise ValueError(f"unsupported write concern option {key!r}")
+    return WriteConcern(**options)
+
+
+def write_concern_for(tier: str) -> WriteConcern:
+    cached = _write_concerns.get(tier)
+    if cached is not None:
+        return cached
+
+    if tier not in WRITE_TIER_DEFAULTS:
+        raise RuntimeError(f"Unknown write tier: {tier}")
+
+    spec = os.environ.get(f"MONGO_WRITE_CONCERN_{tier.upper()}") or WRITE_TIER_DEFAULTS[tier]
+    try:
+        write_concern = parse_write_concern(spec)
+    except (ConfigurationError, TypeError, ValueError) as error:
+        raise RuntimeError(f"Invalid write concern for {tier}: {spec} ({error})") from error
+
+    _write_concerns[tier] = write_concern
+    return write_concern
+
+
+def get_collection(
+    name: str,
+    read_profile: str = READ_PROFILE_PRIMARY,
+    write_tier: Optional[str] = None,
+) -> Collection:
+    cache_key = (name, read_profile, write_tier)
+    cached = _collections.get(cache_key)
+    if cached is not None:
+        return cached
+
+    database = get_listing_database() if read_profile == READ_PROFILE_LISTING else get_database()
+    collection = database[name].with_options(
+        read_preference=read_preference_for(read_profile),
+        write_concern=write_concern_for(write_tier) if write_tier else None,
+    )
+    _collections[cache_key] = collection
+    return collection
+
+
+def causal_session():
+    """Start a causally consistent session when MONGO_CAUSAL_CONSISTENCY is enabled.
+
+    Used by the user create and update paths, which write and then read the
+    linked organizations, so the read observes the write even across a primary
+    step-down. Yields ``None`` when disabled so callers can pass ``session=``
+    unconditionally.
+    """
+    enabled = os.environ.get("MONGO_CAUSAL_CONSISTENCY", "").strip().lower() in {"1", "true", "yes", "on"}
+    if not enabled:
+        return contextlib.nullcontext()
+    get_database()
+    assert _client is not None
+    return _client.start_session(causal_consistency=True)
 
 
 def ensure_indexes(database) -> None:
@@ -129,6 +940,39 @@ def ensure_indexes(database) -> None:
     database["metrics"].create_index("key", unique=True)
     database["user_credentials"].create_index("user_id", unique=True)
     database["sessions"].create_index("token_hash", unique=True)
+    database["sessions"].create_index("expires_at", expireAfterSeconds=0)
+    database["sessions"].create_index("user_id")
+    for resource in SYNC_RESOURCES:
+        database[resource].create_index([("updated_at", 1), ("_id", 1)])
+    database[DELETIONS_COLLECTION].create_index([("resource", 1), ("deleted_at", 1), ("_id", 1)])
+    retention = deletion_retention_seconds()
+    try:
+        database[DELETIONS_COLLECTION].create_index("deleted_at", name=DELETIONS_TTL_INDEX, expireAfterSeconds=retention)
+    except OperationFailure as error:
+        # IndexOptionsConflict / IndexKeySpecsConflict: the window changed, so update it in place.
+        if error.code not in (85, 86):
+            raise
+        database.command("collMod", DELETIONS_COLLECTION, index={"name": DELETIONS_TTL_INDEX, "expireAfterSeconds": retention})
+
+
+def deletion_retention_seconds() -> int:
+    raw = os.environ.get("TESSARO_DELETION_RETENTION_SECONDS")
+    try:
+        retention = int(raw) if raw else DEFAULT_DELETION_RETENTION_SECONDS
+    except ValueError:
+        return DEFAULT_DELETION_RETENTION_SECONDS
+    return retention if retention > 0 else DEFAULT_DELETION_RETENTION_SECONDS
+
+
+def avatar_to_response(avatar: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not avatar:
+        return None
+    return {
+        "etag": avatar.get("etag"),
+        "content_type": avatar.get("content_type"),
+        "length": avatar.get("length"),
+        "uploaded_at": avatar.get("uploaded_at"),
+    }
 
 
 def user_doc_to_response(doc: Dict[str, Any], organizations_map: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
@@ -145,8 +989,10 @@ def user_doc_to_response(doc: Dict[str, Any], organizations_map: Dict[str, Dict[
         "email": doc.get("email"),
         "role": doc.get("role"),
         "avatar_url": doc.get("avatar_url"),
+        "avatar": avatar_to_response(doc.get("avatar")),
         "created_at": doc.get("created_at"),
         "updated_at": doc.get("updated_at"),
+        "version": doc.get("version", 0),
         "organizations": organizations,
     }
 
@@ -159,6 +1005,7 @@ def organization_doc_to_response(doc: Dict[str, Any]) -> Dict[str, Any]:
         "status": doc.get("status"),
         "created_at": doc.get("created_at"),
         "updated_at": doc.get("updated_at"),
+        "version": doc.get("version", 0),
     }
 
 
@@ -177,6 +1024,7 @@ def service_doc_to_response(doc: Dict[str, Any]) -> Dict[str, Any]:
         "description": doc.get("description"),
         "created_at": doc.get("created_at"),
         "updated_at": doc.get("updated_at"),
+        "version": doc.get("version", 0),
     }
 
 
@@ -188,8 +1036,8 @@ def metrics_doc_to_timestamp_response(doc: Dict[str, Any]) -> Dict[str, Any]:
     return {"value": doc.get("value")}
 
 
-def hash_password(password: str) -> Tuple[str, str]:
-    salt = secrets.token_hex(16)
+def hash_password(password: str, salt: Optional[str] = None) -> Tuple[str, str]:
+    salt = salt or secrets.token_hex(16)
     hashed = hashlib.pbkdf2_hmac(
         "sha256",
         password.encode("utf-8"),
@@ -256,102 +1104,162 @@ def parse_json_body(data: Any, request_dict: Dict[str, Any]) -> Dict[str, Any]:
     raise ValidationError("Unsupported request body type")
 
 
-def parse_request(context: Any) -> Tuple[str, str, Dict[str, List[str]], Dict[str, Any]]:
-    flask_available = False
-    headers_from_flask: Dict[str, Any] = {}
-    query: Dict[str, List[str]] = {}
+def read_binary_body(data: Any, request_dict: Dict[str, Any], max_bytes: int, declared: Optional[str]) -> bytes:
+    """Read a raw request body, rejecting it with 413 once it exceeds ``max_bytes``.
+
+    The declared Content-Length is checked before anything is read, and Flask's
+    input stream is read at most one byte past the limit.
+    """
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise ValidationError(f"request body exceeds {max_bytes} bytes", status=413)
+
+    candidate = data
+    if candidate is None:
+        candidate = request_dict.get("body")
 
-    if flask_request is not None:
+    if candidate is None and flask_request is not None:
         try:
-            method = str(flask_request.method or "GET").upper()
-            raw_url = flask_request.url or ""
-            path = flask_request.path or "/"
-            query = {key: flask_request.args.getlist(key) for key in flask_request.args}
-            headers_from_flask = {key: value for key, value in flask_request.headers.items()}
-            flask_available = True
-            request_dict = {
-                "method": method,
-                "url": raw_url,
-                "path": path,
-                "headers": headers_from_flask,
-            }
+            candidate = flask_request.stream.read(max_bytes + 1)  # type: ignore[attr-defined]
         except RuntimeError:
-            flask_available = False
+            candidate = None
+
+    if candidate is None:
+        return b""
+    if isinstance(candidate, str):
+        raise ValidationError("request body must be binary", status=415)
+    if not isinstance(candidate, (bytes, bytearray, memoryview)):
+        raise ValidationError("Unsupported request body type")
+
+    payload = bytes(candidate)
+    if len(payload) > max_bytes:
+        raise ValidationError(f"request body exceeds {max_bytes} bytes", status=413)
+    return payload
+
+
+class lazy_property:
+    """Compute an attribute on first access and store it on the instance.
+
+    Same contract as ``functools.cached_property``, which on Python < 3.12 takes
+    a lock on every access.
+    """
 
-    if not flask_available:
-        context_dict: Dict[str, Any] = context if isinstance(context, dict) else {}
-        print("[tessaro-api] context keys", list(context_dict.keys()))
+    def __init__(self, func):
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = self.func(instance)
+        instance.__dict__[self.name] = value
+        return value
+
+
+class Request:
+    """One invocation's request, decoded on first access.
+
+    The path comes from ``x-tessaro-path`` (set by fission-client.ts), then the
+    ``__path`` query parameter, then the URL itself. Headers, the query string
+    and the body are only decoded when something reads them.
+    """
+
+    def __init__(self, context: Any = None, data: Any = None):
+        context_dict = context if isinstance(context, dict) else {}
         request_dict = context_dict.get("request")
-        if not isinstance(request_dict, dict):
-            request_dict = {}
-        else:
-            print("[tessaro-api] request keys", list(request_dict.keys()))
+        self._context = context_dict
+        self._request = request_dict if isinstance(request_dict, dict) else {}
+        self._data = data
+        self._flask = flask_request if has_request_context is not None and has_request_context() else None
+
+    @lazy_property
+    def method(self) -> str:
+        if self._flask is not None:
+            return str(self._flask.method or "GET").upper()
+        return str(self._request.get("method", "GET")).upper()
+
+    @lazy_property
+    def headers(self) -> Dict[str, str]:
+        """All headers with lower-cased names."""
+        if self._flask is not None:
+            return {key.lower(): value for key, value in self._flask.headers.items()}
+        headers: Dict[str, str] = {}
+        raw = self._request.get("headers")
+        if isinstance(raw, dict):
+            for key, value in raw.items():
+                if type(value) is not str:
+                    if not isinstance(value, list) or not value or not isinstance(value[0], str):
+                        continue
+                    value = value[0]
+                headers[str(key).lower()] = value
+        return headers
+
+    def header(self, name: str) -> Optional[str]:
+        if self._flask is not None:
+            return self._flask.headers.get(name)
+        return self.headers.get(name.lower())
+
+    @lazy_property
+    def _target(self) -> Tuple[str, str, bool]:
+        """``(path, query_string, path_is_encoded)``; only Flask hands back a decoded path."""
+        override = self.header("x-tessaro-path")
+        if not override:
+            if self._flask is not None:
+                override = self._flask.args.get("__path")
+            else:
+                override = first_value(parse_qs(urlsplit(self._url).query), "__path")
+        if override:
+            path, _, query_string = override.partition("?")
+            return "/" + path.lstrip("/"), query_string, True
+
+        if self._flask is not None:
+            return self._flask.path or "/", self._flask.query_string.decode("latin-1"), False
+        parsed = urlsplit(self._url)
+        return parsed.path or self._request.get("path") or self._context.get("path") or "/", parsed.query, True
+
+    @property
+    def _url(self) -> str:
+        raw_url = self._request.get("url") or self._context.get("url") or ""
+        return raw_url if isinstance(raw_url, str) else ""
+
+    @property
+    def path(self) -> str:
+        return self._target[0]
+
+    @lazy_property
+    def segments(self) -> List[str]:
+        # Split before decoding so an encoded "/" inside an id stays in its segment.
+        path, _, encoded = self._target
+        return [unquote(segment) if encoded else segment for segment in path.split("/") if segment]
+
+    @lazy_property
+    def query(self) -> Dict[str, List[str]]:
+        return parse_qs(self._target[1])
+
+    @lazy_property
+    def body(self) -> Dict[str, Any]:
+        # Handlers never read a body on GET or DELETE, so don't parse one.
+        if self.method in ("GET", "DELETE"):
+            return {}
+        return parse_json_body(self._data, self._request)
 
-        method = str(request_dict.get("method", "GET")).upper()
-        raw_url = request_dict.get("url") or context_dict.get("url") or ""
+    def binary_body(self, max_bytes: int) -> bytes:
+        return read_binary_body(self._data, self._request, max_bytes, self.header("content-length"))
 
-        path = request_dict.get("path") or context_dict.get("path") or "/"
-        if isinstance(raw_url, str) and raw_url:
-            parsed = urlparse(raw_url)
-            path = parsed.path or path
-            query = parse_qs(parsed.query)
-    else:
-        raw_url = raw_url  # type: ignore  # already defined above
-
-    override_path = None
-    if "__path" in query:
-        override_path = first_value(query, "__path")
-        query.pop("__path", None)
-        if override_path:
-            from urllib.parse import unquote
-            override_path = unquote(unquote(override_path))
-
-    if override_path is None:
-        headers = request_dict.get("headers")
-        if not headers and headers_from_flask:
-            headers = headers_from_flask
-        if isinstance(headers, dict):
-            for key, value in headers.items():
-                if isinstance(key, str) and key.lower() == "x-tessaro-path":
-                    if isinstance(value, str):
-                        override_path = value
-                    elif isinstance(value, list) and value:
-                        first_header = value[0]
-                        if isinstance(first_header, str):
-                            override_path = first_header
-                    break
-
-    if override_path:
-        parsed_override = urlparse(override_path if override_path.startswith("/") else f"/{override_path.lstrip('/')}")
-        path = parsed_override.path or "/"
-        query = parse_qs(parsed_override.query)
-
-    print("[tessaro-api] parse_request", {
-        "method": method,
-        "raw_url": raw_url,
-        "resolved_path": path,
-        "query_keys": list(query.keys()),
-        "override_path": override_path,
-        "flask_available": flask_available,
-    })
 
-    return method, path or "/", query, request_dict
+HeaderLookup = Callable[[str], Optional[str]]
+
+
+def no_header(_name: str) -> Optional[str]:
+    return None
 
 
 def first_value(query: Dict[str, List[str]], key: str) -> Optional[str]:
-    values = query.get(key)
-    if not values:
-        return None
-    for value in values:
+    # ``parse_qs`` has already percent-decoded the values once.
+    for value in query.get(key) or ():
         normalized = normalize_string(value)
         if normalized is not None:
-            from urllib.parse import unquote_plus
-            try:
-                from urllib.parse import unquote_plus
-                decoded = unquote_plus(normalized)
-                return unquote_plus(decoded) if "%" in decoded else decoded
-            except Exception:
-                return normalized
+            return normalized
     return None
 
 
@@ -384,18 +1292,102 @@ def resolve_organization_ids(raw_ids: Any) -> Tuple[List[str], List[str]]:
     return normalized, missing
 
 
-def collect_organizations_map(organization_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+def collect_organizations_map(
+    organization_ids: List[str],
+    read_profile: str = READ_PROFILE_PRIMARY,
+    session: Optional[ClientSession] = None,
+) -> Dict[str, Dict[str, Any]]:
     if not organization_ids:
         return {}
 
-    organizations = get_collection("organizations")
-    cursor = organizations.find({"_id": {"$in": organization_ids}})
+    organizations = get_collection("organizations", read_profile)
+    cursor = organizations.find({"_id": {"$in": organization_ids}}, session=session)
     return {doc["_id"]: organization_doc_to_response(doc) for doc in cursor}
 
 
-def handle_users(method: str, segments: List[str], query: Dict[str, List[str]], body: Dict[str, Any]):
-    users = get_collection("users")
-    organizations = get_collection("organizations")
+def version_etag(doc: Dict[str, Any]) -> Dict[str, str]:
+    return {"etag": f'"{doc.get("version", 0)}"'}
+
+
+def parse_expected_version(header: HeaderLookup, body: Dict[str, Any]) -> Optional[int]:
+    raw: Any = header("if-match")
+    if raw is not None:
+        raw = raw.strip()
+        if raw == "*":
+            return None
+        if raw.startswith("W/"):
+            raw = raw[2:]
+        raw = raw.strip('"')
+    elif body.get("expected_version") is not None:
+        raw = body.get("expected_version")
+    else:
+        return None
+
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        raise ValidationError("If-Match/expected_version must be an integer version")
+
+
+def version_filter(expected_version: int) -> Dict[str, Any]:
+    # Documents written before versioning was introduced count as version 0.
+    if expected_version == 0:
+        return {"$or": [{"version": 0}, {"version": {"$exists": False}}]}
+    return {"version": expected_version}
+
+
+def versioned_update(
+    collection: Collection,
+    identifier: str,
+    updates: Dict[str, Any],
+    expected_version: Optional[int],
+    label: str,
+    session: Optional[ClientSession] = None,
+) -> Dict[str, Any]:
+    """Apply ``updates`` and bump ``version`` in one findAndModify round trip.
+
+    When ``expected_version`` is given the update is conditional on it; a miss
+    then costs one extra read to tell a missing document (404) from a stale
+    version (412).
+    """
+    query: Dict[str, Any] = {"_id": identifier}
+    if expected_version is not None:
+        query.update(version_filter(expected_version))
+
+    if updates:
+        updated = collection.find_one_and_update(
+            query,
+            {"$set": updates, "$inc": {"version": 1}},
+            return_document=ReturnDocument.AFTER,
+            session=session,
+        )
+    else:
+        updated = collection.find_one(query, session=session)
+
+    if updated is not None:
+        return updated
+
+    current = None
+    if expected_version is not None:
+        current = collection.find_one({"_id": identifier}, {"version": 1}, session=session)
+
+    if current is None:
+        raise ValidationError(f"{label} not found", status=404)
+    raise ValidationError(
+        f"{label} version mismatch: expected {expected_version}, current is {current.get('version', 0)}",
+        status=412,
+    )
+
+
+def handle_users(
+    method: str,
+    segments: List[str],
+    query: Dict[str, List[str]],
+    body: Dict[str, Any],
+    header: HeaderLookup = no_header,
+):
+    users = get_collection("users", write_tier=WRITE_TIER_IDENTITY)
+    users_listing = get_collection("users", READ_PROFILE_LISTING)
 
     user_id = segments[2] if len(segments) > 2 else None
     organization_filter = first_value(query, "organization_id")
@@ -414,12 +1406,13 @@ def handle_users(method: str, segments: List[str], query: Dict[str, List[str]],
             return make_error(404, "User not found")
 
         org_map = collect_organizations_map(doc.get("organization_ids") or [])
-        return make_response(200, user_doc_to_response(doc, org_map))
+        return make_response(200, user_doc_to_response(doc, org_map), version_etag(doc))
 
     if method == "GET":
         summary = first_value(query, "summary")
         if summary == "count":
-            docs = [doc for doc in users.find({}) if should_include(doc)]
+            users_count = get_collection("users", READ_PROFILE_COUNT)
+            docs = [doc for doc in users_count.find({}) if should_include(doc)]
             return make_response(200, {"count": len(docs)})
 
         email = first_value(query, "email")
@@ -428,13 +1421,13 @@ def handle_users(method: str, segments: List[str], query: Dict[str, List[str]],
             if not doc or not should_include(doc):
                 return make_error(404, "User not found")
             org_map = collect_organizations_map(doc.get("organization_ids") or [])
-            return make_response(200, user_doc_to_response(doc, org_map))
+            return make_response(200, user_doc_to_response(doc, org_map), version_etag(doc))
 
-        docs = [doc for doc in users.find({}) if should_include(doc)]
+        docs = [doc for doc in users_listing.find({}) if should_include(doc)]
         all_org_ids: List[str] = []
         for doc in docs:
             all_org_ids.extend(doc.get("organization_ids") or [])
-        org_map = collect_organizations_map(list(set(all_org_ids)))
+        org_map = collect_organizations_map(list(set(all_org_ids)), READ_PROFILE_LISTING)
         payload = [user_doc_to_response(doc, org_map) for doc in docs]
         try:
             return make_response(200, payload)
@@ -464,7 +1457,7 @@ def handle_users(method: str, segments: List[str], query: Dict[str, List[str]],
             raise ValidationError("organization_ids required")
 
         identifier = sanitize_identifier(body.get("id")) or str(uuid.uuid4())
-        timestamp = iso_now()
+        timestamp = utc_now()
 
         doc = {
             "_id": identifier,
@@ -475,27 +1468,30 @@ def handle_users(method: str, segments: List[str], query: Dict[str, List[str]],
             "organization_ids": organization_ids,
             "created_at": timestamp,
             "updated_at": timestamp,
+            "version": 1,
         }
 
-        try:
-            users.insert_one(doc)
-        except DuplicateKeyError:
-            raise ValidationError("user already exists", status=409)
-        except PyMongoError as error:
-            raise RuntimeError(f"Failed to create user: {error}") from error
+        with causal_session() as session:
+            try:
+                users.insert_one(doc, session=session)
+            except DuplicateKeyError:
+                raise ValidationError("user already exists", status=409)
+            except PyMongoError as error:
+                if error.timeout:
+                    raise
+                raise RuntimeError(f"Failed to create user: {error}") from error
 
-        org_map = collect_organizations_map(organization_ids)
-        return make_response(201, user_doc_to_response(doc, org_map))
+            org_map = collect_organizations_map(organization_ids, session=session)
+        return make_response(201, user_doc_to_response(doc, org_map), version_etag(doc))
 
     if method in ("PATCH", "PUT") and user_id:
-        doc = users.find_one({"_id": user_id})
-        if not doc:
-            return make_error(404, "User not found")
-
+        expected_version = parse_expected_version(header, body)
         updates: Dict[str, Any] = {}
 
         if "name" in body:
-            updates["name"] = normalize_string(body.get("name")) or doc.get("name")
+            new_name = normalize_string(body.get("name"))
+            if new_name:
+                updates["name"] = new_name
         if "email" in body:
             new_email = normalize_string(body.get("email"))
             if not new_email:
@@ -511,33 +1507,42 @@ def handle_users(method: str, segments: List[str], query: Dict[str, List[str]],
                 raise ValidationError(f"organizations not found: {', '.join(missing)}")
             updates["organization_ids"] = organization_ids
 
-        if not updates:
-            return make_response(200, user_doc_to_response(doc, collect_organizations_map(doc.get("organization_ids") or [])))
-
-        updates["updated_at"] = iso_now()
+        if updates:
+            updates["updated_at"] = utc_now()
 
-        try:
-            users.update_one({"_id": user_id}, {"$set": updates})
-        except DuplicateKeyError:
-            raise ValidationError("email already in use", status=409)
+        with causal_session() as session:
+            try:
+                updated = versioned_update(users, user_id, updates, expected_version, "User", session)
+            except DuplicateKeyError:
+                raise ValidationError("email already in use", status=409)
 
-        updated = users.find_one({"_id": user_id}) or doc
-        org_map = collect_organizations_map(updated.get("organization_ids") or [])
-        return make_response(200, user_doc_to_response(updated, org_map))
+            org_map = collect_organizations_map(updated.get("organization_ids") or [], session=session)
+        return make_response(200, user_doc_to_response(updated, org_map), version_etag(updated))
 
     if method == "DELETE" and user_id:
-        result = users.delete_one({"_id": user_id})
-        if result.deleted_count == 0:
+        # Revoke first: it is idempotent, so a retry after a failure here still
+        # finds the user and finishes the job instead of getting a 404.
+        revoke_user_access(user_id)
+        deleted = users.find_one_and_delete({"_id": user_id}, projection={"avatar": 1})
+        if deleted is None:
             return make_error(404, "User not found")
+        record_deletion("users", user_id, WRITE_TIER_IDENTITY)
+        delete_avatar_file(deleted.get("avatar"))
         return no_content()
 
     return make_error(405, "Method not allowed")
 
 
-def handle_organizations(method: str, segments: List[str], query: Dict[str, List[str]], body: Dict[str, Any]):
-    organizations = get_collection("organizations")
-    users = get_collection("users")
-    services = get_collection("services")
+def handle_organizations(
+    method: str,
+    segments: List[str],
+    query: Dict[str, List[str]],
+    body: Dict[str, Any],
+    header: HeaderLookup = no_header,
+):
+    organizations = get_collection("organizations", write_tier=WRITE_TIER_CATALOG)
+    users = get_collection("users", write_tier=WRITE_TIER_CATALOG)
+    services = get_collection("services", write_tier=WRITE_TIER_CATALOG)
 
     organization_id = segments[2] if len(segments) > 2 else None
 
@@ -545,15 +1550,15 @@ def handle_organizations(method: str, segments: List[str], query: Dict[str, List
         doc = organizations.find_one({"_id": organization_id})
         if not doc:
             return make_error(404, "Organization not found")
-        return make_response(200, organization_doc_to_response(doc))
+        return make_response(200, organization_doc_to_response(doc), version_etag(doc))
 
     if method == "GET":
         summary = first_value(query, "summary")
         if summary == "count":
-            count = organizations.count_documents({})
+            count = get_collection("organizations", READ_PROFILE_COUNT).count_documents({})
             return make_response(200, {"count": count})
 
-        docs = list(organizations.find({}))
+        docs = list(get_collection("organizations", READ_PROFILE_LISTING).find({}))
         payload = [organization_doc_to_response(doc) for doc in docs]
         return make_response(200, payload)
 
@@ -566,7 +1571,7 @@ def handle_organizations(method: str, segments: List[str], query: Dict[str, List
             raise ValidationError("name is required")
 
         identifier = sanitize_identifier(body.get("id")) or str(uuid.uuid4())
-        timestamp = iso_now()
+        timestamp = utc_now()
 
         doc = {
             "_id": identifier,
@@ -575,6 +1580,7 @@ def handle_organizations(method: str, segments: List[str], query: Dict[str, List
             "status": status,
             "created_at": timestamp,
             "updated_at": timestamp,
+            "version": 1,
         }
 
         try:
@@ -582,13 +1588,10 @@ def handle_organizations(method: str, segments: List[str], query: Dict[str, List
         except DuplicateKeyError:
             raise ValidationError("organization already exists", status=409)
 
-        return make_response(201, organization_doc_to_response(doc))
+        return make_response(201, organization_doc_to_response(doc), version_etag(doc))
 
     if method in ("PATCH", "PUT") and organization_id:
-        doc = organizations.find_one({"_id": organization_id})
-        if not doc:
-            return make_error(404, "Organization not found")
-
+        expected_version = parse_expected_version(header, body)
         updates: Dict[str, Any] = {}
 
         if "name" in body:
@@ -597,40 +1600,58 @@ def handle_organizations(method: str, segments: List[str], query: Dict[str, List
                 raise ValidationError("name cannot be empty")
             updates["name"] = new_name
         if "plan" in body:
-            updates["plan"] = normalize_string(body.get("plan")) or doc.get("plan")
+            new_plan = normalize_string(body.get("plan"))
+            if new_plan:
+                updates["plan"] = new_plan
         if "status" in body:
-            updates["status"] = normalize_string(body.get("status")) or doc.get("status")
+            new_status = normalize_string(body.get("status"))
+            if new_status:
+                updates["status"] = new_status
 
-        if not updates:
-            return make_response(200, organization_doc_to_response(doc))
+        if updates:
+            updates["updated_at"] = utc_now()
 
-        updates["updated_at"] = iso_now()
-
-        organizations.update_one({"_id": organization_id}, {"$set": updates})
-        updated = organizations.find_one({"_id": organization_id}) or doc
-        return make_response(200, organization_doc_to_response(updated))
+        try:
+            updated = versioned_update(organizations, organization_id, updates, expected_version, "Organization")
+        except DuplicateKeyError:
+            raise ValidationError("organization name already in use", status=409)
+        return make_response(200, organization_doc_to_response(updated), version_etag(updated))
 
     if method == "DELETE" and organization_id:
         result = organizations.delete_one({"_id": organization_id})
         if result.deleted_count == 0:
             return make_error(404, "Organization not found")
+        record_deletion("organizations", organization_id, WRITE_TIER_CATALOG)
 
-        users.update_many({}, {"$pull": {"organization_ids": organization_id}})
-        services.update_many({}, {"$pull": {"organization_ids": organization_id}})
+        # Bump updated_at/version so delta sync clients see the detached members.
+        detach = {
+            "$pull": {"organization_ids": organization_id},
+            "$set": {"updated_at": utc_now()},
+            "$inc": {"version": 1},
+        }
+        users.update_many({"organization_ids": organization_id}, detach)
+        services.update_many({"organization_ids": organization_id}, detach)
         return no_content()
 
     return make_error(405, "Method not allowed")
 
 
-def handle_services(method: str, segments: List[str], body: Dict[str, Any], query: Dict[str, List[str]]):
-    services = get_collection("services")
+def handle_services(
+    method: str,
+    segments: List[str],
+    body: Dict[str, Any],
+    query: Dict[str, List[str]],
+    header: HeaderLookup = no_header,
+):
+    services = get_collection("services", write_tier=WRITE_TIER_CATALOG)
 
     if len(segments) > 2 and segments[2] == "query" and method == "POST":
         organization_ids, _missing = resolve_organization_ids(body.get("organization_ids"))
         if not organization_ids:
             return make_response(200, [])
 
-        cursor = services.find({"organization_ids": {"$in": organization_ids}})
+        services_listing = get_collection("services", READ_PROFILE_LISTING)
+        cursor = services_listing.find({"organization_ids": {"$in": organization_ids}})
         docs = list(cursor)
         payload = [service_doc_to_response(doc) for doc in docs]
         return make_response(200, payload)
@@ -641,15 +1662,15 @@ def handle_services(method: str, segments: List[str], body: Dict[str, Any], quer
         doc = services.find_one({"_id": service_id})
         if not doc:
             return make_error(404, "Service not found")
-        return make_response(200, service_doc_to_response(doc))
+        return make_response(200, service_doc_to_response(doc), version_etag(doc))
 
     if method == "GET":
         summary = first_value(query, "summary")
         if summary == "count":
-            count = services.count_documents({})
+            count = get_collection("services", READ_PROFILE_COUNT).count_documents({})
             return make_response(200, {"count": count})
 
-        docs = list(services.find({}))
+        docs = list(get_collection("services", READ_PROFILE_LISTING).find({}))
         payload = [service_doc_to_response(doc) for doc in docs]
         return make_response(200, payload)
 
@@ -669,7 +1690,7 @@ def handle_services(method: str, segments: List[str], body: Dict[str, Any], quer
             raise ValidationError("service_type is required")
 
         identifier = sanitize_identifier(body.get("id")) or str(uuid.uuid4())
-        timestamp = iso_now()
+        timestamp = utc_now()
 
         doc = {
             "_id": identifier,
@@ -681,6 +1702,7 @@ def handle_services(method: str, segments: List[str], body: Dict[str, Any], quer
             "description": description if description is None or isinstance(description, str) else str(description),
             "created_at": timestamp,
             "updated_at": timestamp,
+            "version": 1,
         }
 
         try:
@@ -688,13 +1710,10 @@ def handle_services(method: str, segments: List[str], body: Dict[str, Any], quer
         except DuplicateKeyError:
             raise ValidationError("service already exists", status=409)
 
-        return make_response(201, service_doc_to_response(doc))
+        return make_response(201, service_doc_to_response(doc), version_etag(doc))
 
     if method in ("PATCH", "PUT") and service_id:
-        doc = services.find_one({"_id": service_id})
-        if not doc:
-            return make_error(404, "Service not found")
-
+        expected_version = parse_expected_version(header, body)
         updates: Dict[str, Any] = {}
 
         if "name" in body:
@@ -708,7 +1727,9 @@ def handle_services(method: str, segments: List[str], body: Dict[str, Any], quer
                 raise ValidationError("service_type cannot be empty")
             updates["service_type"] = new_type
         if "status" in body:
-            updates["status"] = normalize_string(body.get("status")) or doc.get("status")
+            new_status = normalize_string(body.get("status"))
+            if new_status:
+                updates["status"] = new_status
         if "description" in body:
             value = body.get("description")
             updates["description"] = value if value is None or isinstance(value, str) else str(value)
@@ -723,37 +1744,281 @@ def handle_services(method: str, segments: List[str], body: Dict[str, Any], quer
             except (TypeError, ValueError):
                 raise ValidationError("organization_count must be numeric")
 
-        if not updates:
-            return make_response(200, service_doc_to_response(doc))
+        if updates:
+            updates["updated_at"] = utc_now()
 
-        updates["updated_at"] = iso_now()
-        services.update_one({"_id": service_id}, {"$set": updates})
-        updated = services.find_one({"_id": service_id}) or doc
-        return make_response(200, service_doc_to_response(updated))
+        try:
+            updated = versioned_update(services, service_id, updates, expected_version, "Service")
+        except DuplicateKeyError:
+            raise ValidationError("service name already in use", status=409)
+        return make_response(200, service_doc_to_response(updated), version_etag(updated))
 
     if method == "DELETE" and service_id:
         result = services.delete_one({"_id": service_id})
         if result.deleted_count == 0:
             return make_error(404, "Service not found")
+        record_deletion("services", service_id, WRITE_TIER_CATALOG)
         return no_content()
 
     return make_error(405, "Method not allowed")
 
 
+def export_collections() -> List[str]:
+    configured = os.environ.get("TESSARO_EXPORT_COLLECTIONS") or DEFAULT_EXPORT_COLLECTIONS
+    return [name.strip() for name in configured.split(",") if name.strip()]
+
+
+def parse_since(value: Optional[str]) -> Optional[dt.datetime]:
+    try:
+        return parse_timestamp(value)
+    except ValueError:
+        raise ValidationError("since must be an ISO-8601 timestamp")
+
+
+def encode_ndjson(documents: Iterator[RawBSONDocument]) -> Iterator[bytes]:
+    buffer: List[bytes] = []
+    size = 0
+    for raw in documents:
+        line = json.dumps(bson.decode(raw.raw, DECODE_CODEC_OPTIONS), default=_json_default).encode("utf-8") + b"\n"
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def encode_raw_bson(documents: Iterator[RawBSONDocument]) -> Iterator[bytes]:
+    buffer: List[bytes] = []
+    size = 0
+    for raw in documents:
+        buffer.append(raw.raw)
+        size += len(raw.raw)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def gzip_chunks(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def handle_export(method: str, segments: List[str], query: Dict[str, List[str]], header: HeaderLookup):
+    if method != "GET":
+        return make_error(405, "Method not allowed")
+
+    name = segments[2] if len(segments) > 2 else None
+    if not name or name not in export_collections():
+        return make_error(404, "Export collection not found")
+
+    export_format = first_value(query, "format") or "ndjson"
+    if export_format not in ("ndjson", "bson"):
+        raise ValidationError("format must be ndjson or bson")
+
+    raw_batch_size = first_value(query, "batch_size") or os.environ.get("TESSARO_EXPORT_BATCH_SIZE")
+    try:
+        batch_size = int(raw_batch_size) if raw_batch_size else DEFAULT_EXPORT_BATCH_SIZE
+    except ValueError:
+        raise ValidationError("batch_size must be a positive integer")
+    if batch_size <= 0:
+        raise ValidationError("batch_size must be a positive integer")
+
+    criteria: Dict[str, Any] = {}
+    since = parse_since(first_value(query, "since"))
+    if since is not None:
+        criteria["updated_at"] = {"$gt": since}
+
+    collection = get_collection(name, READ_PROFILE_LISTING).with_options(codec_options=RAW_CODEC_OPTIONS)
+    cursor = collection.find(criteria, batch_size=batch_size)
+
+    # Pull the first batch while the request deadline still applies so query
+    # errors surface as a status code rather than a truncated stream.
+    first = next(cursor, None)
+
+    def documents() -> Iterator[RawBSONDocument]:
+        try:
+            if first is None:
+                return
+            yield first
+            yield from cursor
+        except PyMongoError as error:
+            # Re-raise so the transfer is cut off instead of ending like a complete
+            # export (gzip_chunks then never writes its trailer either).
+            print("[tessaro-api] export aborted mid-stream:", name, repr(error))
+            raise
+        finally:
+            cursor.close()
+
+    if export_format == "bson":
+        chunks = encode_raw_bson(documents())
+        response_headers = {"content-type": "application/bson"}
+    else:
+        chunks = encode_ndjson(documents())
+        response_headers = {"content-type": "application/x-ndjson"}
+
+    compression = first_value(query, "compression")
+    accepts_gzip = "gzip" in (header("accept-encoding") or "").lower()
+    if compression == "gzip" or (compression is None and accepts_gzip):
+        chunks = gzip_chunks(chunks)
+        response_headers["content-encoding"] = "gzip"
+
+    return make_stream(200, chunks, response_headers)
+
+
+def record_deletion(resource: str, document_id: str, write_tier: str) -> None:
+    deletions = get_collection(DELETIONS_COLLECTION, write_tier=write_tier)
+    deletions.insert_one({
+        "_id": str(uuid.uuid4()),
+        "resource": resource,
+        "document_id": document_id,
+        "deleted_at": utc_now(),
+    })
+
+
+def encode_sync_token(state: Dict[str, List[Any]]) -> str:
+    serializable = {
+        stream: [position[0].isoformat() if position[0] is not None else None, position[1]]
+        for stream, position in state.items()
+    }
+    raw = json.dumps(serializable, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_sync_token(token: Optional[str]) -> Dict[str, List[Any]]:
+    """Decode a ``since`` value into per-stream ``[timestamp, last_id]`` positions.
+
+    Accepts tokens previously returned as ``next`` as well as a bare ISO-8601
+    timestamp for the first sync; no token means "from the beginning".
+    """
+    if not token:
+        return {"changes": [None, None], "deleted": [None, None]}
+
+    state = None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        state = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeDecodeError):
+        pass
+
+    if isinstance(state, dict) and "changes" in state and "deleted" in state:
+        try:
+            return {stream: [parse_timestamp(state[stream][0]), state[stream][1]] for stream in ("changes", "deleted")}
+        except (TypeError, ValueError, IndexError):
+            raise ValidationError("since token is malformed")
+
+    watermark = parse_since(token)
+    return {"changes": [watermark, None], "deleted": [watermark, None]}
+
+
+def keyset_query(field: str, position: List[Any], upper: dt.datetime) -> Dict[str, Any]:
+    after, last_id = position
+    if after is None:
+        lower: Dict[str, Any] = {}
+    elif last_id is None:
+        lower = {field: {"$gt": after}}
+    else:
+        lower = {"$or": [{field: {"$gt": after}}, {field: after, "_id": {"$gt": last_id}}]}
+    return {"$and": [lower, {field: {"$lte": upper}}]}
+
+
+def read_keyset_page(
+    collection: Collection,
+    criteria: Dict[str, Any],
+    field: str,
+    position: List[Any],
+    upper: dt.datetime,
+    limit: int,
+) -> Tuple[List[Dict[str, Any]], List[Any], bool]:
+    if position[0] is not None and position[0] > upper:
+        # A token minted later than this request's upper bound (clock skew
+        # between instances) keeps its position instead of moving back.
+        return [], position, False
+    query = {**criteria, **keyset_query(field, position, upper)}
+    docs = list(collection.find(query).sort([(field, 1), ("_id", 1)]).limit(limit + 1))
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+    if has_more:
+        return docs, [docs[-1][field], docs[-1]["_id"]], True
+    return docs, [upper, None], False
+
+
+def handle_changes(resource: str, query: Dict[str, List[str]]):
+    raw_limit = first_value(query, "limit")
+    try:
+        limit = min(int(raw_limit), MAX_SYNC_LIMIT) if raw_limit else DEFAULT_SYNC_LIMIT
+    except ValueError:
+        raise ValidationError("limit must be an integer")
+    if limit <= 0:
+        raise ValidationError("limit must be positive")
+
+    state = decode_sync_token(first_value(query, "since"))
+    now = utc_now()
+    upper = now - dt.timedelta(seconds=SYNC_SAFETY_LAG_SECONDS)
+
+    # Tombstones older than the retention window may already be gone, so the
+    # client cannot learn about every delete since its token: make it resync.
+    deleted_after = state["deleted"][0]
+    if deleted_after is not None and deleted_after < now - dt.timedelta(seconds=deletion_retention_seconds()):
+        raise ValidationError("since is older than the deletion retention window; resync from the beginning", status=410)
+
+    docs, changes_next, changes_more = read_keyset_page(
+        get_collection(resource, READ_PROFILE_SYNC), {}, "updated_at", state["changes"], upper, limit
+    )
+    tombstones, deleted_next, deleted_more = read_keyset_page(
+        get_collection(DELETIONS_COLLECTION, READ_PROFILE_SYNC),
+        {"resource": resource},
+        "deleted_at",
+        state["deleted"],
+        upper,
+        limit,
+    )
+
+    if resource == "users":
+        org_ids = list({org_id for doc in docs for org_id in doc.get("organization_ids") or []})
+        org_map = collect_organizations_map(org_ids, READ_PROFILE_SYNC)
+        payload = [user_doc_to_response(doc, org_map) for doc in docs]
+    elif resource == "organizations":
+        payload = [organization_doc_to_response(doc) for doc in docs]
+    else:
+        payload = [service_doc_to_response(doc) for doc in docs]
+
+    return make_response(200, {
+        "changes": payload,
+        "deleted": [{"id": doc.get("document_id"), "deleted_at": doc.get("deleted_at")} for doc in tombstones],
+        "next": encode_sync_token({"changes": changes_next, "deleted": deleted_next}),
+        "has_more": changes_more or deleted_more,
+    })
+
+
 def handle_metrics_increment(body: Dict[str, Any]):
-    metrics = get_collection("metrics")
+    metrics = get_collection("metrics", write_tier=WRITE_TIER_METRICS)
     key = normalize_string(body.get("key"))
     if not key:
         raise ValidationError("key is required")
 
-    timestamp = iso_now()
+    timestamp = utc_now()
+    update = {
+        "$inc": {"value": 1},
+        "$set": {"updated_at": timestamp, "key": key, "kind": "number"},
+        "$setOnInsert": {"created_at": timestamp},
+    }
+
+    if not metrics.write_concern.acknowledged:
+        # Fire-and-forget tier: the server never reports the new value back.
+        metrics.update_one({"_id": key, "kind": "number"}, update, upsert=True)
+        return make_response(202, {"value": None})
+
     doc = metrics.find_one_and_update(
         {"_id": key, "kind": "number"},
-        {
-            "$inc": {"value": 1},
-            "$set": {"updated_at": timestamp, "key": key, "kind": "number"},
-            "$setOnInsert": {"created_at": timestamp},
-        },
+        update,
         upsert=True,
         return_document=ReturnDocument.AFTER,
     )
@@ -762,7 +2027,7 @@ def handle_metrics_increment(body: Dict[str, Any]):
 
 
 def handle_metrics_number(method: str, query: Dict[str, List[str]], body: Dict[str, Any]):
-    metrics = get_collection("metrics")
+    metrics = get_collection("metrics", write_tier=WRITE_TIER_METRICS)
 
     if method == "POST":
         key = normalize_string(body.get("key"))
@@ -773,7 +2038,7 @@ def handle_metrics_number(method: str, query: Dict[str, List[str]], body: Dict[s
         except (TypeError, ValueError):
             raise ValidationError("value must be an integer")
 
-        timestamp = iso_now()
+        timestamp = utc_now()
         metrics.update_one(
             {"_id": key, "kind": "number"},
             {
@@ -788,7 +2053,7 @@ def handle_metrics_number(method: str, query: Dict[str, List[str]], body: Dict[s
         key = first_value(query, "key")
         if not key:
             raise ValidationError("key is required")
-        doc = metrics.find_one({"_id": key, "kind": "number"})
+        doc = get_collection("metrics", READ_PROFILE_METRICS).find_one({"_id": key, "kind": "number"})
         if not doc:
             return make_error(404, "Metric not found")
         return make_response(200, metrics_doc_to_number_response(doc))
@@ -797,17 +2062,15 @@ def handle_metrics_number(method: str, query: Dict[str, List[str]], body: Dict[s
 
 
 def handle_metrics_timestamp(method: str, query: Dict[str, List[str]], body: Dict[str, Any]):
-    metrics = get_collection("metrics")
+    metrics = get_collection("metrics", write_tier=WRITE_TIER_METRICS)
 
     if method == "POST":
         key = normalize_string(body.get("key"))
         if not key:
             raise ValidationError("key is required")
-        value = body.get("value")
-        if value is not None:
-            value = normalize_string(value)
+        value = parse_timestamp_field(body, "value")
 
-        timestamp = iso_now()
+        timestamp = utc_now()
         metrics.update_one(
             {"_id": key, "kind": "timestamp"},
             {
@@ -822,7 +2085,7 @@ def handle_metrics_timestamp(method: str, query: Dict[str, List[str]], body: Dic
         key = first_value(query, "key")
         if not key:
             raise ValidationError("key is required")
-        doc = metrics.find_one({"_id": key, "kind": "timestamp"})
+        doc = get_collection("metrics", READ_PROFILE_METRICS).find_one({"_id": key, "kind": "timestamp"})
         if not doc:
             return make_error(404, "Metric not found")
         return make_response(200, metrics_doc_to_timestamp_response(doc))
@@ -830,8 +2093,15 @@ def handle_metrics_timestamp(method: str, query: Dict[str, List[str]], body: Dic
     return make_error(405, "Method not allowed")
 
 
-def handle_sessions(method: str, segments: List[str], body: Dict[str, Any]):
-    sessions = get_collection("sessions")
+def handle_sessions(method: str, segments: List[str], query: Dict[str, List[str]], body: Dict[str, Any]):
+    sessions = get_collection("sessions", write_tier=WRITE_TIER_IDENTITY)
+
+    if method == "DELETE" and len(segments) == 2:
+        user_id = sanitize_identifier(first_value(query, "user_id"))
+        if not user_id:
+            raise ValidationError("user_id is required")
+        revoked = sessions.delete_many({"user_id": user_id}).deleted_count
+        return make_response(200, {"revoked": revoked})
 
     if method == "POST":
         token_hash = sanitize_identifier(body.get("token_hash"))
@@ -843,10 +2113,10 @@ def handle_sessions(method: str, segments: List[str], body: Dict[str, Any]):
             "token_hash": token_hash,
             "user_id": body.get("user_id"),
             "organization_id": body.get("organization_id"),
-            "issued_at": body.get("issued_at"),
-            "expires_at": body.get("expires_at"),
-            "created_at": iso_now(),
-            "updated_at": iso_now(),
+            "issued_at": parse_timestamp_field(body, "issued_at"),
+            "expires_at": parse_timestamp_field(body, "expires_at"),
+            "created_at": utc_now(),
+            "updated_at": utc_now(),
         }
         sessions.replace_one({"_id": token_hash}, doc, upsert=True)
         return no_content(201)
@@ -877,9 +2147,9 @@ def handle_sessions(method: str, segments: List[str], body: Dict[str, Any]):
             "token_hash": token_hash,
             "user_id": body.get("user_id"),
             "organization_id": body.get("organization_id"),
-            "issued_at": body.get("issued_at"),
-            "expires_at": body.get("expires_at"),
-            "updated_at": iso_now(),
+            "issued_at": parse_timestamp_field(body, "issued_at"),
+            "expires_at": parse_timestamp_field(body, "expires_at"),
+            "updated_at": utc_now(),
         }
 
         sessions.replace_one({"_id": token_hash}, payload, upsert=True)
@@ -892,9 +2162,210 @@ def handle_sessions(method: str, segments: List[str], body: Dict[str, Any]):
     return make_error(405, "Method not allowed")
 
 
-def handle_user_credentials(body: Dict[str, Any]):
-    credentials = get_collection("user_credentials")
+def avatar_max_bytes() -> int:
+    raw = os.environ.get("TESSARO_AVATAR_MAX_BYTES")
+    try:
+        return int(raw) if raw else DEFAULT_AVATAR_MAX_BYTES
+    except ValueError:
+        return DEFAULT_AVATAR_MAX_BYTES
+
+
+def avatar_bucket() -> GridFSBucket:
+    return GridFSBucket(
+        get_database(),
+        bucket_name=AVATAR_BUCKET,
+        write_concern=write_concern_for(WRITE_TIER_IDENTITY),
+    )
+
+
+def delete_avatar_file(avatar: Optional[Dict[str, Any]]) -> None:
+    if not avatar or not avatar.get("file_id"):
+        return
+    try:
+        avatar_bucket().delete(avatar["file_id"])
+    except NoFile:
+        pass
+
+
+def parse_byte_range(header: Optional[str], length: int) -> Optional[Tuple[int, int]]:
+    """Resolve a single ``bytes=`` range to inclusive offsets.
+
+    Returns ``None`` when the whole file should be served (no header, a
+    multi-range or malformed request) and raises 416 when it cannot be satisfied.
+    """
+    if not header or not header.startswith("bytes=") or "," in header:
+        return None
+    start_text, _, end_text = header[len("bytes="):].strip().partition("-")
+    try:
+        if not start_text:
+            suffix = int(end_text)
+            if suffix <= 0:
+                raise ValueError
+            start, end = max(0, length - suffix), length - 1
+        else:
+            start = int(start_text)
+            end = min(int(end_text), length - 1) if end_text else length - 1
+    except ValueError:
+        return None
+    if start >= length or start > end:
+        raise ValidationError("requested range not satisfiable", status=416)
+    return start, end
+
+
+def handle_avatar(method: str, user_id: str, body: Any, header: HeaderLookup):
+    users = get_collection("users", write_tier=WRITE_TIER_IDENTITY)
+
+    if method == "GET":
+        doc = users.find_one({"_id": user_id}, projection={"avatar": 1})
+        if doc is None:
+            return make_error(404, "User not found")
+        avatar = doc.get("avatar")
+        if not avatar:
+            return make_error(404, "Avatar not found")
+
+        etag = f'"{avatar["etag"]}"'
+        cache_headers = {
+            "etag": etag,
+            "cache-control": os.environ.get("TESSARO_AVATAR_CACHE_CONTROL") or DEFAULT_AVATAR_CACHE_CONTROL,
+            "accept-ranges": "bytes",
+        }
+        if_none_match = header("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+            return "", 304, cache_headers
+
+        length = int(avatar.get("length") or 0)
+        byte_range = None
+        if_range = header("if-range")
+        if not if_range or if_range.strip() == etag:
+            try:
+                byte_range = parse_byte_range(header("range"), length)
+            except ValidationError:
+                return "", 416, {**cache_headers, "content-range": f"bytes */{length}"}
+
+        try:
+            grid_out = avatar_bucket().open_download_stream(avatar["file_id"])
+        except NoFile:
+            return make_error(404, "Avatar not found")
+
+        start, end = byte_range if byte_range else (0, length - 1)
+        grid_out.seek(start)
+
+        def chunks() -> Iterator[bytes]:
+            remaining = end - start + 1
+            try:
+                while remaining > 0:
+                    chunk = grid_out.read(min(grid_out.chunk_size, remaining))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    yield chunk
+            except PyMongoError as error:
+                print("[tessaro-api] avatar aborted mid-stream:", user_id, repr(error))
+            finally:
+                grid_out.close()
+
+        response_headers = {
+            **cache_headers,
+            "content-type": avatar.get("content_type") or "application/octet-stream",
+            "content-length": str(end - start + 1),
+        }
+        if byte_range:
+            response_headers["content-range"] = f"bytes {start}-{end}/{length}"
+            return make_stream(206, chunks(), response_headers)
+        return make_stream(200, chunks(), response_headers)
+
+    if method == "PUT":
+        content_type = (header("content-type") or "").split(";")[0].strip().lower()
+        if content_type not in AVATAR_CONTENT_TYPES:
+            raise ValidationError(f"content-type must be one of {', '.join(sorted(AVATAR_CONTENT_TYPES))}", status=415)
+        if not isinstance(body, bytes) or not body:
+            raise ValidationError("avatar body is required")
+
+        if users.count_documents({"_id": user_id}, limit=1) == 0:
+            return make_error(404, "User not found")
+
+        etag = hashlib.sha256(body).hexdigest()
+        bucket = avatar_bucket()
+        file_id = str(uuid.uuid4())
+        bucket.upload_from_stream_with_id(
+            file_id,
+            user_id,
+            body,
+            metadata={"user_id": user_id, "content_type": content_type, "sha256": etag},
+        )
+        avatar = {
+            "file_id": file_id,
+            "etag": etag,
+            "content_type": content_type,
+            "length": len(body),
+            "uploaded_at": utc_now(),
+        }
+        previous = users.find_one_and_update(
+            {"_id": user_id},
+            {"$set": {"avatar": avatar, "updated_at": avatar["uploaded_at"]}, "$inc": {"version": 1}},
+            projection={"avatar": 1},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if previous is None:
+            delete_avatar_file(avatar)
+            return make_error(404, "User not found")
+        delete_avatar_file(previous.get("avatar"))
+        return make_response(200, avatar_to_response(avatar), {"etag": f'"{etag}"'})
+
+    if method == "DELETE":
+        previous = users.find_one_and_update(
+            {"_id": user_id, "avatar": {"$exists": True}},
+            {"$unset": {"avatar": ""}, "$set": {"updated_at": utc_now()}, "$inc": {"version": 1}},
+            projection={"avatar": 1},
+            return_document=ReturnDocument.BEFORE,
+        )
+        if previous is None:
+            return make_error(404, "Avatar not found")
+        delete_avatar_file(previous.get("avatar"))
+        return no_content()
+
+    return make_error(405, "Method not allowed")
+
 
+def revoke_user_access(user_id: str, credential_update: Optional[Dict[str, Any]] = None) -> None:
+    """Delete every session for ``user_id`` and either delete its credential or,
+    when ``credential_update`` is given, upsert the credential with it.
+
+    Sent as a single ``MongoClient.bulk_write`` spanning both collections on
+    MongoDB 8.0+. Older servers reject client-level bulk writes before anything
+    is written, so we remember that and fall back to one write per collection.
+    """
+    global _client_bulk_write_supported
+
+    database = get_database()
+    write_concern = write_concern_for(WRITE_TIER_IDENTITY)
+    sessions_ns = f"{database.name}.sessions"
+    credentials_ns = f"{database.name}.user_credentials"
+
+    def credential_op(namespace: Optional[str] = None):
+        kwargs = {"namespace": namespace} if namespace else {}
+        if credential_update is None:
+            return DeleteOne({"_id": user_id}, **kwargs)
+        return UpdateOne({"_id": user_id}, credential_update, upsert=True, **kwargs)
+
+    if _client_bulk_write_supported is not False:
+        assert _client is not None
+        models = [DeleteMany({"user_id": user_id}, namespace=sessions_ns), credential_op(credentials_ns)]
+        try:
+            _client.bulk_write(models, ordered=False, write_concern=write_concern)
+            _client_bulk_write_supported = True
+            return
+        except InvalidOperation as exc:
+            if _client_bulk_write_supported:
+                raise
+            print("[tessaro-api] client bulk write unavailable, using per-collection writes:", repr(exc))
+            _client_bulk_write_supported = False
+
+    get_collection("sessions", write_tier=WRITE_TIER_IDENTITY).delete_many({"user_id": user_id})
+    get_collection("user_credentials", write_tier=WRITE_TIER_IDENTITY).bulk_write([credential_op()])
+
+
+def handle_user_credentials(body: Dict[str, Any]):
     user_id = sanitize_identifier(body.get("user_id"))
     if not user_id:
         raise ValidationError("user_id is required")
@@ -903,11 +2374,21 @@ def handle_user_credentials(body: Dict[str, Any]):
     if not isinstance(password, str) or not password:
         raise ValidationError("password is required")
 
-    salt, password_hash = hash_password(password)
-    timestamp = iso_now()
+    # Hash once with the stored salt (a fresh one for new credentials): an
+    # unchanged hash means the current password was re-posted (e.g. the seed on
+    # every startup), which neither rewrites the credential nor revokes sessions.
+    stored = get_collection("user_credentials").find_one({"_id": user_id}, {"password_hash": 1, "salt": 1}) or {}
+    stored_salt = stored.get("salt") if isinstance(stored.get("salt"), str) else None
+    salt, password_hash = hash_password(password, stored_salt)
+    stored_hash = stored.get("password_hash")
+    if isinstance(stored_hash, str) and secrets.compare_digest(password_hash.encode("utf-8"), stored_hash.encode("utf-8")):
+        return no_content()
 
-    credentials.update_one(
-        {"_id": user_id},
+    timestamp = utc_now()
+
+    # A password change signs the user out everywhere.
+    revoke_user_access(
+        user_id,
         {
             "$set": {
                 "user_id": user_id,
@@ -917,53 +2398,233 @@ def handle_user_credentials(body: Dict[str, Any]):
             },
             "$setOnInsert": {"created_at": timestamp},
         },
-        upsert=True,
     )
 
     return no_content()
 
 
-def main(context=None, data=None):
-    print("[tessaro-api] main invoked", {"context_type": type(context).__name__, "data_type": type(data).__name__})
+def resolve_deadline_seconds(requested: Optional[str], started: float) -> float:
+    """Remaining request budget in seconds, measured from ``started``.
+
+    Callers may shorten the budget with ``x-tessaro-deadline-ms`` (milliseconds
+    remaining when the request was sent) but never extend it past
+    TESSARO_DEADLINE_MS.
+    """
+    raw_default = os.environ.get("TESSARO_DEADLINE_MS")
     try:
-        method, path, query, request_dict = parse_request(context)
-        print("[tessaro-api] headers", request_dict.get("headers"))
-        body = parse_json_body(data, request_dict)
-        segments = [segment for segment in path.split("/") if segment]
-
-        print("[tessaro-api] request", method, path, "segments=", segments)
-
-        if len(segments) < 2 or segments[0] != "tessaro":
-            return make_error(404, "Not found")
-
-        resource = segments[1]
-
-        if resource == "users":
-            return handle_users(method, segments, query, body)
-        if resource == "organizations":
-            return handle_organizations(method, segments, query, body)
-        if resource == "services":
-            return handle_services(method, segments, body, query)
-        if resource == "metrics":
-            if len(segments) > 2 and segments[2] == "increment" and method == "POST":
-                return handle_metrics_increment(body)
-            if len(segments) > 2 and segments[2] == "number":
-                return handle_metrics_number(method, query, body)
-            if len(segments) > 2 and segments[2] == "timestamp":
-                return handle_metrics_timestamp(method, query, body)
-            return make_error(404, "Metric endpoint not found")
-        if resource == "sessions":
-            return handle_sessions(method, segments, body)
-        if resource == "user-credentials" and method == "POST":
-            return handle_user_credentials(body)
-
-        return make_error(404, "Not found")
+        budget_ms = int(raw_default) if raw_default else DEFAULT_DEADLINE_MS
+    except ValueError:
+        budget_ms = DEFAULT_DEADLINE_MS
+
+    if requested is not None:
+        try:
+            budget_ms = min(budget_ms, int(requested.strip()))
+        except ValueError:
+            raise ValidationError(f"{DEADLINE_HEADER} must be an integer number of milliseconds")
+
+    return budget_ms / 1000 - (time.monotonic() - started)
+
+
+def sync_resource(segment: str) -> str:
+    if segment not in SYNC_RESOURCES:
+        raise ValueError(segment)
+    return segment
+
+
+ROUTE_PARAM_TYPES = {"str": str, "sync": sync_resource}
+
+
+class Route:
+    """A method/path pattern bound to a handler and an admission class.
 
+    Patterns are slash-separated; ``{name}`` captures a segment and
+    ``{name:type}`` converts it with ``ROUTE_PARAM_TYPES[type]``, a conversion
+    error meaning "no match". ``admission`` is a route class, ``None`` to skip
+    admission control, or a callable taking the request.
+    """
+
+    __slots__ = ("methods", "pattern", "handler", "admission", "parts")
+
+    def __init__(self, methods: Any, pattern: str, handler: Any, admission: Any = ADMISSION_STANDARD):
+        self.methods = frozenset([methods] if isinstance(methods, str) else methods)
+        self.pattern = pattern
+        self.handler = handler
+        self.admission = admission
+        self.parts: List[Any] = []
+        for part in pattern.strip("/").split("/"):
+            if part.startswith("{") and part.endswith("}"):
+                name, _, type_name = part[1:-1].partition(":")
+                self.parts.append((name, ROUTE_PARAM_TYPES[type_name or "str"]))
+            else:
+                self.parts.append(part)
+
+    def match(self, segments: List[str]) -> Optional[Dict[str, Any]]:
+        params: Dict[str, Any] = {}
+        for part, segment in zip(self.parts, segments):
+            if isinstance(part, str):
+                if part != segment:
+                    return None
+                continue
+            name, convert = part
+            try:
+                params[name] = convert(segment)
+            except ValueError:
+                return None
+        return params
+
+    def route_class(self, request: Request) -> Optional[str]:
+        return self.admission(request) if callable(self.admission) else self.admission
+
+
+class RouteTable:
+    """Routes bucketed by segment count; within a bucket the first match wins."""
+
+    def __init__(self, routes: List[Route]):
+        self._by_length: Dict[int, List[Route]] = {}
+        for route in routes:
+            self._by_length.setdefault(len(route.parts), []).append(route)
+
+    def resolve(self, method: str, segments: List[str]) -> Tuple[Route, Dict[str, Any]]:
+        path_matched = False
+        for route in self._by_length.get(len(segments), ()):
+            params = route.match(segments)
+            if params is None:
+                continue
+            if method in route.methods:
+                return route, params
+            path_matched = True
+        if path_matched:
+            raise ValidationError("Method not allowed", status=405)
+        raise ValidationError("Not found", status=404)
+
+
+def users_route(request: Request, **_params: str):
+    return handle_users(request.method, request.segments, request.query, request.body, request.header)
+
+
+def organizations_route(request: Request, **_params: str):
+    return handle_organizations(request.method, request.segments, request.query, request.body, request.header)
+
+
+def services_route(request: Request, **_params: str):
+    return handle_services(request.method, request.segments, request.body, request.query, request.header)
+
+
+def sessions_route(request: Request, **_params: str):
+    return handle_sessions(request.method, request.segments, request.query, request.body)
+
+
+def avatar_route(request: Request, user_id: str):
+    body = request.binary_body(avatar_max_bytes()) if request.method == "PUT" else None
+    return handle_avatar(request.method, user_id, body, request.header)
+
+
+def users_listing_class(request: Request) -> str:
+    return ADMISSION_AUTH if first_value(request.query, "email") else ADMISSION_BULK
+
+
+ROUTES = RouteTable([
+    Route("GET", "/tessaro/admission", lambda request: make_response(200, admission.snapshot()), admission=None),
+    Route("GET", "/tessaro/pool", lambda request: make_response(200, pool_snapshot()), admission=None),
+    Route(
+        "GET",
+        "/tessaro/{resource:sync}/changes",
+        lambda request, resource: handle_changes(resource, request.query),
+        admission=ADMISSION_BULK,
+    ),
+    Route(("GET", "PUT", "DELETE"), "/tessaro/users/{user_id}/avatar", avatar_route),
+    Route("GET", "/tessaro/users", users_route, admission=users_listing_class),
+    Route("POST", "/tessaro/users", users_route),
+    Route("GET", "/tessaro/users/{user_id}", users_route, admission=ADMISSION_AUTH),
+    Route(("PATCH", "PUT", "DELETE"), "/tessaro/users/{user_id}", users_route),
+    Route("GET", "/tessaro/organizations", organizations_route, admission=ADMISSION_BULK),
+    Route("POST", "/tessaro/organizations", organizations_route),
+    Route(("GET", "PATCH", "PUT", "DELETE"), "/tessaro/organizations/{organization_id}", organizations_route),
+    Route("POST", "/tessaro/services/query", services_route, admission=ADMISSION_BULK),
+    Route("GET", "/tessaro/services", services_route, admission=ADMISSION_BULK),
+    Route("POST", "/tessaro/services", services_route),
+    Route(("GET", "PATCH", "PUT", "DELETE"), "/tessaro/services/{service_id}", services_route),
+    Route(
+        "GET",
+        "/tessaro/export/{collection}",
+        lambda request, collection: handle_export(request.method, request.segments, request.query, request.header),
+        admission=ADMISSION_BULK,
+    ),
+    Route("POST", "/tessaro/metrics/increment", lambda request: handle_metrics_increment(request.body)),
+    Route(
+        ("GET", "POST"),
+        "/tessaro/metrics/number",
+        lambda request: handle_metrics_number(request.method, request.query, request.body),
+    ),
+    Route(
+        ("GET", "POST"),
+        "/tessaro/metrics/timestamp",
+        lambda request: handle_metrics_timestamp(request.method, request.query, request.body),
+    ),
+    Route(("POST", "DELETE"), "/tessaro/sessions", sessions_route, admission=ADMISSION_AUTH),
+    Route(("GET", "PUT", "DELETE"), "/tessaro/sessions/{token_hash}", sessions_route, admission=ADMISSION_AUTH),
+    # PBKDF2 hashing is CPU-bound; keep it from crowding out session checks.
+    Route("POST", "/tessaro/user-credentials", lambda request: handle_user_credentials(request.body), admission=ADMISSION_BULK),
+])
+
+
+def main(context=None, data=None):
+    request = Request(context, data)
+    reason = profiler.reason(request.header(PROFILE_HEADER))
+    if reason is None:
+        return handle_request(request)
+    return profiler.run(reason, handle_request, request)
+
+
+def handle_request(request: Request):
+    started = time.monotonic()
+    try:
+        print("[tessaro-api] request", request.method, request.path)
+        route, params = ROUTES.resolve(request.method, request.segments)
+
+        remaining = resolve_deadline_seconds(request.header(DEADLINE_HEADER), started)
+        if remaining <= 0:
+            return deadline_exceeded("dispatch")
+        deadline_at = time.monotonic() + remaining
+
+        route_class = route.route_class(request)
+        if route_class is not None:
+            admission.acquire(route_class, remaining)
+            _pending_release.callback = functools.partial(admission.release, route_class)
+        try:
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                return deadline_exceeded("dispatch")
+
+            command_tracker.reset()
+            with operation_timeout(remaining):
+                return route.handler(request, **params)
+        finally:
+            # Still set unless make_stream handed the slot to a streamed body.
+            release = getattr(_pending_release, "callback", None)
+            _pending_release.callback = None
+            if release is not None:
+                release()
+
+    except AdmissionRejected as error:
+        print("[tessaro-api] shed request:", error.route_class, str(error))
+        return make_response(
+            429,
+            {"message": str(error), "route_class": error.route_class},
+            {"retry-after": str(ADMISSION_RETRY_AFTER_SECONDS)},
+        )
     except ValidationError as error:
         return make_error(getattr(error, "status", 400), str(error))
     except PyMongoError as error:
+        if error.timeout:
+            operation = command_tracker.current()
+            print("[tessaro-api] Mongo deadline exceeded:", operation, repr(error))
+            return deadline_exceeded(operation)
         print("[tessaro-api] Mongo error:", repr(error))
         return make_error(500, "Database error")
     except Exception as error:  # pylint: disable=broad-except
         print("[tessaro-api] unhandled error:", repr(error))
         return make_error(500, "Internal server error")
+
+
+prewarm_clients()
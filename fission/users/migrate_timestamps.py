@@ -0,0 +1,164 @@
+"""Convert ISO-string timestamps stored by older releases into BSON dates.
+
+Online and resumable: documents are scanned in ``_id`` order in batches, each
+conversion is conditional on the original string still being present (so a
+concurrent write wins), and the last processed ``_id`` per collection is
+checkpointed in the ``migrations`` collection. Re-running picks up after the
+checkpoint; ``--restart`` scans from the beginning again.
+
+    python -m users.migrate_timestamps --batch-size 500 --pause-ms 50
+    python -m users.migrate_timestamps --collection sessions --dry-run
+
+Uses the same connection settings as the function (mounted secret or
+MONGO_* environment variables).
+"""
+
+import argparse
+import time
+from typing import Any, Dict, List, Optional
+
+from . import main as users_main
+
+from pymongo import UpdateOne  # noqa: E402  (main puts the vendored driver on sys.path)
+
+MIGRATION_ID = "timestamps-to-bson-dates"
+MIGRATIONS_COLLECTION = "migrations"
+
+TIMESTAMP_FIELDS: Dict[str, List[str]] = {
+    "users": ["created_at", "updated_at"],
+    "organizations": ["created_at", "updated_at"],
+    "services": ["created_at", "updated_at"],
+    "metrics": ["created_at", "updated_at", "value"],
+    "sessions": ["issued_at", "expires_at", "created_at", "updated_at"],
+    "user_credentials": ["created_at", "updated_at"],
+    users_main.DELETIONS_COLLECTION: ["deleted_at"],
+}
+
+
+def pending_filter(collection: str) -> Dict[str, Any]:
+    clauses = [{field: {"$type": "string"}} for field in TIMESTAMP_FIELDS[collection]]
+    if collection == "metrics":
+        # Only timestamp metrics keep a date in ``value``; number metrics never match.
+        clauses = [clause for clause in clauses if "value" not in clause]
+        clauses.append({"kind": "timestamp", "value": {"$type": "string"}})
+    return {"$or": clauses}
+
+
+def convert_document(doc: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    converted: Dict[str, Any] = {}
+    for field in fields:
+        value = doc.get(field)
+        if not isinstance(value, str):
+            continue
+        if field == "value" and doc.get("kind") != "timestamp":
+            continue
+        try:
+            parsed = users_main.parse_timestamp(value)
+        except ValueError:
+            continue
+        converted[field] = parsed
+    return converted
+
+
+def migrate_collection(
+    database,
+    collection: str,
+    batch_size: int,
+    pause_seconds: float,
+    dry_run: bool,
+    restart: bool,
+) -> Dict[str, int]:
+    fields = TIMESTAMP_FIELDS[collection]
+    target = database[collection]
+    checkpoints = database[MIGRATIONS_COLLECTION]
+    checkpoint_id = f"{MIGRATION_ID}:{collection}"
+
+    checkpoint = None if restart else checkpoints.find_one({"_id": checkpoint_id})
+    last_id: Optional[Any] = checkpoint.get("last_id") if checkpoint else None
+    totals = {
+        "scanned": checkpoint.get("scanned", 0) if checkpoint else 0,
+        "converted": checkpoint.get("converted", 0) if checkpoint else 0,
+        "unparseable": checkpoint.get("unparseable", 0) if checkpoint else 0,
+    }
+
+    base_filter = pending_filter(collection)
+    remaining = target.count_documents(base_filter if last_id is None else {"$and": [base_filter, {"_id": {"$gt": last_id}}]})
+    print(f"[migrate] {collection}: {remaining} documents pending" + (f" after _id {last_id!r}" if last_id is not None else ""))
+
+    started = time.monotonic()
+    while True:
+        query = base_filter if last_id is None else {"$and": [base_filter, {"_id": {"$gt": last_id}}]}
+        projection = {field: 1 for field in fields}
+        projection["kind"] = 1
+        batch = list(target.find(query, projection).sort("_id", 1).limit(batch_size))
+        if not batch:
+            break
+
+        operations = []
+        for doc in batch:
+            converted = convert_document(doc, fields)
+            if len(converted) < sum(1 for field in fields if isinstance(doc.get(field), str)):
+                totals["unparseable"] += 1
+            if not converted:
+                continue
+            guard = {"_id": doc["_id"], **{field: doc[field] for field in converted}}
+            operations.append(UpdateOne(guard, {"$set": converted}))
+
+        if operations and not dry_run:
+            result = target.bulk_write(operations, ordered=False)
+            totals["converted"] += result.modified_count
+        elif dry_run:
+            totals["converted"] += len(operations)
+
+        totals["scanned"] += len(batch)
+        last_id = batch[-1]["_id"]
+        if not dry_run:
+            checkpoints.update_one(
+                {"_id": checkpoint_id},
+                {"$set": {"last_id": last_id, **totals, "updated_at": users_main.utc_now()}},
+                upsert=True,
+            )
+
+        elapsed = time.monotonic() - started
+        rate = totals["scanned"] / elapsed if elapsed else 0.0
+        print(
+            f"[migrate] {collection}: scanned={totals['scanned']} converted={totals['converted']} "
+            f"unparseable={totals['unparseable']} last_id={last_id!r} rate={rate:.0f}/s"
+        )
+
+        if pause_seconds:
+            time.sleep(pause_seconds)
+
+    if not dry_run:
+        checkpoints.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"completed_at": users_main.utc_now()}},
+            upsert=True,
+        )
+    return totals
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--collection", action="append", choices=sorted(TIMESTAMP_FIELDS), help="limit to a collection (repeatable)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause-ms", type=int, default=100, help="sleep between batches to throttle load on the primary")
+    parser.add_argument("--dry-run", action="store_true", help="count convertible documents without writing")
+    parser.add_argument("--restart", action="store_true", help="ignore saved checkpoints and rescan from the first _id")
+    args = parser.parse_args(argv)
+
+    database = users_main.get_database()
+    for collection in args.collection or list(TIMESTAMP_FIELDS):
+        totals = migrate_collection(
+            database,
+            collection,
+            batch_size=args.batch_size,
+            pause_seconds=args.pause_ms / 1000,
+            dry_run=args.dry_run,
+            restart=args.restart,
+        )
+        print(f"[migrate] {collection}: done {totals}")
+
+
+if __name__ == "__main__":
+    main()